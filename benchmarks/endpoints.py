@@ -0,0 +1,338 @@
+"""Latency and query counts for every API route, driven through the Flask test client.
+
+Seeds a scratch database (or reuses one made by benchmarks/seed.py), then
+calls each route ``--iterations`` times and writes JSON with p50/p95/p99
+latency and SQL statements per request, one entry per route. Routes that
+have no scenario here are listed under "uncovered" so new endpoints show up.
+Scenarios that got any non-2xx answer are listed under "failing" and make the
+script exit with status 1, since their timings partly measure error paths.
+Compare the JSON of two commits to spot regressions.
+
+    python benchmarks/endpoints.py --scale small --iterations 50 --output before.json
+    python benchmarks/endpoints.py --database /tmp/bench.db --output after.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import seed
+
+METRICS_TOKEN = 'bench'
+
+SKIPPED = {
+    ('GET', '/api/stream/dashboard'): 'never-ending event stream',
+}
+
+
+class Scenario:
+    """One route to time. ``path`` and ``body`` may be callables taking the run context;
+    ``prepare`` runs untimed before each call and may return a path override."""
+
+    def __init__(self, method, rule, path=None, body=None, prepare=None, auth=True, name=None, headers=None):
+        self.method = method
+        self.rule = rule
+        self.path = path or rule
+        self.body = body
+        self.prepare = prepare
+        self.auth = auth
+        self.name = name or f'{method} {rule}'
+        self.headers = headers
+
+
+class Context:
+    """Ids of seeded rows and a counter for unique names."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.sequence = 0
+        self.available_menu_ids = []
+
+    def refresh(self):
+        """Re-read which menu items can be ordered; scenarios such as the toggle change it."""
+        from src.models.menu import MenuItem
+        from src.models.user import db
+        self.available_menu_ids = [item_id for item_id, in db.session.query(MenuItem.id)
+                                   .filter_by(is_available=True).order_by(MenuItem.id)]
+
+    def next(self):
+        self.sequence += 1
+        return self.sequence
+
+    def menu_id(self):
+        return 1 + self.sequence % self.counts['menu_items']
+
+    def available_menu_id(self, offset=0):
+        return self.available_menu_ids[(self.sequence + offset) % len(self.available_menu_ids)]
+
+    def event_id(self):
+        return 1 + self.sequence % self.counts['events']
+
+    def inventory_id(self):
+        return 1 + self.sequence % self.counts['inventory_items']
+
+    def order_id(self):
+        return 1 + self.sequence % self.counts['orders']
+
+
+def _add(row):
+    from src.models.user import db
+    db.session.add(row)
+    db.session.commit()
+    return row.id
+
+
+def _new_menu_item(ctx):
+    from src.models.menu import MenuItem
+    return f'/api/menu/{_add(MenuItem(name=f"Bench dish {ctx.next()}", price=9.5, category="main", created_by=1))}'
+
+
+def _new_event(ctx):
+    from src.models.event import Event
+    return f'/api/events/{_add(Event(title=f"Bench event {ctx.next()}", event_date=datetime.utcnow(), created_by=1))}'
+
+
+def _new_inventory_item(ctx):
+    from src.models.inventory import InventoryItem
+    return f'/api/inventory/{_add(InventoryItem(name=f"Bench item {ctx.next()}", category="dry goods", unit="kg"))}'
+
+
+def _new_order(ctx):
+    from src.models.order import Order
+    order = Order(customer_name='Bench', total_amount=9.5, status='pending', created_at=datetime.utcnow())
+    order.set_order_items([{'menu_item_id': 1, 'name': 'Dish 1', 'price': 9.5, 'quantity': 1, 'total': 9.5}])
+    return f'/api/orders/{_add(order)}'
+
+
+def _new_user(ctx):
+    from src.models.user import User
+    user = User(username=f'bench{ctx.next()}', email=f'bench{ctx.sequence}@example.com', password_hash='x', role='chef')
+    return f'/api/users/{_add(user)}'
+
+
+def _order_body(ctx):
+    return {'customer_name': 'Bench customer', 'order_type': 'takeaway',
+            'order_items': [{'menu_item_id': ctx.available_menu_id(), 'quantity': 2},
+                            {'menu_item_id': ctx.available_menu_id(1), 'quantity': 1}]}
+
+
+def scenarios():
+    since = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    return [
+        Scenario('GET', '/', auth=False),
+        Scenario('GET', '/<path:path>', path='/admin.html', auth=False),
+        Scenario('GET', '/static/<path:filename>', path='/static/script.js', auth=False),
+        Scenario('GET', '/api/_metrics', headers={'Authorization': f'Bearer {METRICS_TOKEN}'}),
+        Scenario('POST', '/api/auth/login', body={'username': 'admin', 'password': seed.BENCH_PASSWORD}, auth=False),
+        Scenario('POST', '/api/auth/logout'),
+        Scenario('GET', '/api/auth/me'),
+        Scenario('POST', '/api/auth/register', auth=False,
+                 body=lambda ctx: {'username': f'reg{ctx.next()}', 'email': f'reg{ctx.sequence}@example.com',
+                                   'password': 'bench', 'role': 'user'}),
+        Scenario('GET', '/api/users'),
+        Scenario('POST', '/api/users', body=lambda ctx: {'username': f'new{ctx.next()}', 'email': f'new{ctx.sequence}@example.com',
+                                                         'password': 'bench', 'role': 'chef'}),
+        Scenario('GET', '/api/users/<int:user_id>', path='/api/users/2'),
+        Scenario('PUT', '/api/users/<int:user_id>', path='/api/users/2', body={'is_active': True}),
+        Scenario('DELETE', '/api/users/<int:user_id>', prepare=_new_user),
+        Scenario('GET', '/api/menu', auth=False),
+        Scenario('POST', '/api/menu', body=lambda ctx: {'name': f'New dish {ctx.next()}', 'price': 12, 'category': 'main'}),
+        Scenario('GET', '/api/menu/categories', auth=False),
+        Scenario('GET', '/api/menu/<int:item_id>', path=lambda ctx: f'/api/menu/{ctx.menu_id()}', auth=False),
+        Scenario('PUT', '/api/menu/<int:item_id>', path=lambda ctx: f'/api/menu/{ctx.menu_id()}', body={'description': 'Updated'}),
+        Scenario('DELETE', '/api/menu/<int:item_id>', prepare=_new_menu_item),
+        Scenario('PATCH', '/api/menu/<int:item_id>/toggle-availability', path=lambda ctx: f'/api/menu/{ctx.menu_id()}/toggle-availability'),
+        Scenario('GET', '/api/menu/<int:item_id>/recipe', path=lambda ctx: f'/api/menu/{ctx.menu_id()}/recipe'),
+        Scenario('PUT', '/api/menu/<int:item_id>/recipe', path=lambda ctx: f'/api/menu/{ctx.menu_id()}/recipe',
+                 body=lambda ctx: {'ingredients': [{'inventory_item_id': ctx.inventory_id(), 'quantity': 0.2}]}),
+        Scenario('GET', '/api/events', auth=False),
+        Scenario('POST', '/api/events', body=lambda ctx: {'title': f'New event {ctx.next()}',
+                                                          'event_date': datetime.utcnow().isoformat()}),
+        Scenario('GET', '/api/events/<int:event_id>', path=lambda ctx: f'/api/events/{ctx.event_id()}', auth=False),
+        Scenario('PUT', '/api/events/<int:event_id>', path=lambda ctx: f'/api/events/{ctx.event_id()}', body={'description': 'Updated'}),
+        Scenario('DELETE', '/api/events/<int:event_id>', prepare=_new_event),
+        Scenario('PATCH', '/api/events/<int:event_id>/toggle-active', path=lambda ctx: f'/api/events/{ctx.event_id()}/toggle-active'),
+        Scenario('GET', '/api/customer/bootstrap', auth=False),
+        Scenario('GET', '/api/inventory'),
+        Scenario('POST', '/api/inventory', body=lambda ctx: {'name': f'New item {ctx.next()}', 'category': 'dairy', 'unit': 'kg'}),
+        Scenario('GET', '/api/inventory/categories'),
+        Scenario('GET', '/api/inventory/low-stock'),
+        Scenario('GET', '/api/inventory/<int:item_id>', path=lambda ctx: f'/api/inventory/{ctx.inventory_id()}'),
+        Scenario('PUT', '/api/inventory/<int:item_id>', path=lambda ctx: f'/api/inventory/{ctx.inventory_id()}', body={'unit_cost': 2.5}),
+        Scenario('DELETE', '/api/inventory/<int:item_id>', prepare=_new_inventory_item),
+        Scenario('GET', '/api/inventory/<int:item_id>/movements', path=lambda ctx: f'/api/inventory/{ctx.inventory_id()}/movements'),
+        Scenario('GET', '/api/inventory/<int:item_id>/stock-at',
+                 path=lambda ctx: f'/api/inventory/{ctx.inventory_id()}/stock-at?at={since}'),
+        Scenario('POST', '/api/inventory/<int:item_id>/stock-movement',
+                 path=lambda ctx: f'/api/inventory/{ctx.inventory_id()}/stock-movement',
+                 body={'movement_type': 'in', 'quantity': 1, 'reason': 'Benchmark'}),
+        Scenario('POST', '/api/inventory/stock-movements/bulk',
+                 body=lambda ctx: {'movements': [{'inventory_item_id': ctx.inventory_id(), 'movement_type': 'out', 'quantity': 0.5},
+                                                 {'inventory_item_id': ctx.inventory_id() % ctx.counts['inventory_items'] + 1,
+                                                  'movement_type': 'in', 'quantity': 0.5}]}),
+        Scenario('GET', '/api/inventory/reports/usage'),
+        Scenario('GET', '/api/inventory/reports/consumption'),
+        Scenario('GET', '/api/inventory/reports/reorder-forecast'),
+        Scenario('POST', '/api/orders', body=_order_body, auth=False),
+        Scenario('GET', '/api/orders'),
+        Scenario('GET', '/api/orders', path='/api/orders?stream=ndjson&limit=1000', name='GET /api/orders (ndjson, 1000 rows)'),
+        Scenario('GET', '/api/orders/<int:order_id>', path=lambda ctx: f'/api/orders/{ctx.order_id()}', auth=False),
+        Scenario('PUT', '/api/orders/<int:order_id>', prepare=_new_order, body={'special_instructions': 'Benchmark'}),
+        Scenario('DELETE', '/api/orders/<int:order_id>', prepare=_new_order),
+        Scenario('PATCH', '/api/orders/<int:order_id>/status', prepare=lambda ctx: _new_order(ctx) + '/status',
+                 body={'status': 'preparing'}),
+        Scenario('GET', '/api/orders/stats'),
+        Scenario('GET', '/api/orders/reports/items'),
+        Scenario('GET', '/api/reports/sales'),
+        Scenario('GET', '/api/reports/sales', path='/api/reports/sales?granularity=day&from=' + since,
+                 name='GET /api/reports/sales (daily, 30 days)'),
+    ]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)]
+
+
+def run_scenario(app, scenario, ctx, iterations, query_counter):
+    from src.models.user import db
+    client = app.test_client()
+    timings, queries, statuses = [], [], {}
+    for _ in range(iterations):
+        ctx.next()
+        with app.app_context():
+            path = scenario.prepare(ctx) if scenario.prepare else None
+            db.session.remove()
+        path = path or (scenario.path(ctx) if callable(scenario.path) else scenario.path)
+        body = scenario.body(ctx) if callable(scenario.body) else scenario.body
+        if scenario.auth:
+            # Sign in as the seeded admin directly, so only the route itself pays for hashing
+            with client.session_transaction() as session:
+                session['user_id'] = 1
+                session['user_role'] = 'admin'
+
+        before = query_counter[0]
+        started = time.perf_counter()
+        response = client.open(path, method=scenario.method, json=body, headers=scenario.headers)
+        response.get_data()  # drain streamed bodies inside the timing
+        elapsed = time.perf_counter() - started
+        response.close()
+        timings.append(elapsed * 1000)
+        queries.append(query_counter[0] - before)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    timings.sort()
+    return {
+        'name': scenario.name,
+        'method': scenario.method,
+        'rule': scenario.rule,
+        'iterations': iterations,
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API route through the Flask test client.')
+    parser.add_argument('--database', help='SQLite file already filled by benchmarks/seed.py (default: seed a scratch one)')
+    parser.add_argument('--scale', choices=sorted(seed.SCALES), default='small',
+                        help='row counts to seed, and the id ranges scenarios draw from')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--only', help='run only scenarios whose name contains this text')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+    counts = seed.SCALES[args.scale]
+
+    scratch = tempfile.TemporaryDirectory()
+    database = os.path.abspath(args.database) if args.database else os.path.join(scratch.name, 'bench.db')
+    # The app reads these at import time, so they must be set before src.main is imported
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ['ARCHIVE_DATABASE_URL'] = f"sqlite:///{os.path.join(scratch.name, 'archive.db')}"
+    os.environ['SHARED_STATE_DIR'] = scratch.name
+    os.environ['METRICS_TOKEN'] = METRICS_TOKEN
+    os.environ.pop('READ_REPLICA_URL', None)
+
+    from sqlalchemy import event
+    from src.main import app
+    from src.models.user import db
+    from src.migrations import upgrade
+
+    query_counter = [0]
+
+    def count_query(*_):
+        query_counter[0] += 1
+
+    with app.app_context():
+        upgrade(echo=lambda message: None)
+        if not args.database:
+            seed.generate(counts, seed=args.seed, echo=lambda message: print(message, file=sys.stderr))
+        for engine in db.engines.values():
+            event.listen(engine, 'after_cursor_execute', count_query)
+
+    ctx = Context(counts)
+    covered = set()
+    results = []
+    for scenario in scenarios():
+        covered.add((scenario.method, scenario.rule))
+        if args.only and args.only not in scenario.name:
+            continue
+        print(f'{scenario.name}', file=sys.stderr)
+        with app.app_context():
+            ctx.refresh()
+            db.session.remove()
+        results.append(run_scenario(app, scenario, ctx, args.iterations, query_counter))
+    failing = [result['name'] for result in results
+               if any(not code.startswith('2') for code in result['status_codes'])]
+    for name in failing:
+        print(f'FAILING: {name} answered non-2xx; its timings are not comparable', file=sys.stderr)
+
+    routes = {(method, rule.rule) for rule in app.url_map.iter_rules()
+              for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    report = {
+        'commit': _git_commit(),
+        'generated_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'database': 'existing' if args.database else 'seeded',
+        'scale': args.scale,
+        'seed': args.seed,
+        'counts': counts,
+        'results': results,
+        'failing': failing,
+        'skipped': [{'method': method, 'rule': rule, 'reason': reason} for (method, rule), reason in SKIPPED.items()],
+        'uncovered': sorted(f'{method} {rule}' for method, rule in routes - covered - set(SKIPPED)),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    scratch.cleanup()
+    if failing:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Seeded synthetic data for benchmarks.
+
+Fills an empty, migrated database with users, menu items (with recipes),
+events, inventory items, stock movements and orders (with order lines), then
+builds the sales rollup and an opening stock snapshot. The same seed and scale
+always produce the same rows, with timestamps relative to the start of the
+current day. Every user's password is BENCH_PASSWORD; the admin is "admin".
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --scale medium
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --orders 1000000 --movements 5000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCALES = {
+    'small': {'users': 10, 'menu_items': 100, 'events': 50, 'inventory_items': 100,
+              'movements': 20_000, 'orders': 10_000},
+    'medium': {'users': 50, 'menu_items': 1_000, 'events': 500, 'inventory_items': 500,
+               'movements': 500_000, 'orders': 100_000},
+    'large': {'users': 200, 'menu_items': 1_000, 'events': 2_000, 'inventory_items': 2_000,
+              'movements': 5_000_000, 'orders': 1_000_000},
+}
+BENCH_PASSWORD = 'bench-password'
+CHUNK_SIZE = 10_000
+
+MENU_CATEGORIES = ('appetizer', 'main', 'dessert', 'beverage')
+INVENTORY_CATEGORIES = ('meat', 'vegetables', 'dairy', 'spices', 'dry goods', 'beverages')
+UNITS = ('kg', 'liters', 'pieces')
+ORDER_STATUSES = ('pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled')
+ORDER_STATUS_WEIGHTS = (3, 2, 2, 1, 80, 12)
+ORDER_TYPES = ('dine_in', 'takeaway', 'delivery')
+MOVEMENT_TYPES = ('out', 'in', 'adjustment')
+MOVEMENT_TYPE_WEIGHTS = (70, 25, 5)
+
+
+def _timestamps(rng, count, start, end):
+    """``count`` sorted random datetimes between ``start`` and ``end``, so ids follow time as in production."""
+    span = (end - start).total_seconds()
+    return (start + timedelta(seconds=offset) for offset in sorted(rng.random() * span for _ in range(count)))
+
+
+def _insert(model, rows):
+    from src.models.user import db
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(model.__table__.insert(), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(model.__table__.insert(), chunk)
+        db.session.commit()
+
+
+def generate(counts, seed=1, days=180, echo=print):
+    """Populate the current app's database; call inside an app context after migrating."""
+    from src.models.user import User, db
+    from src.models.menu import MenuItem
+    from src.models.event import Event
+    from src.models.inventory import InventoryItem, StockMovement, StockSnapshot
+    from src.models.order import Order, OrderLine
+    from src.models.recipe import RecipeIngredient
+    from src.passwords import hash_password
+    from src.routes.order import rebuild_sales_rollup
+
+    if db.session.query(User.id).first() is not None:
+        raise RuntimeError('Database is not empty; seed a fresh one')
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=days)
+
+    started = time.perf_counter()
+    password_hash = hash_password(BENCH_PASSWORD)  # one hash shared by every user keeps seeding fast
+    _insert(User, (
+        {'id': i, 'username': 'admin' if i == 1 else f'chef{i}', 'email': f'user{i}@example.com',
+         'password_hash': password_hash, 'role': 'admin' if i == 1 else 'chef', 'is_active': True,
+         'created_at': start}
+        for i in range(1, counts['users'] + 1)
+    ))
+    echo(f"users: {counts['users']}")
+
+    menu_prices = {}
+    menu_rows = []
+    for i in range(1, counts['menu_items'] + 1):
+        menu_prices[i] = round(rng.uniform(3, 40), 2)
+        menu_rows.append({
+            'id': i, 'name': f'Dish {i}', 'description': f'Synthetic dish number {i}',
+            'price': menu_prices[i], 'category': rng.choice(MENU_CATEGORIES), 'image_url': '',
+            'is_available': rng.random() < 0.9, 'created_by': 1, 'created_at': start, 'updated_at': start
+        })
+    _insert(MenuItem, menu_rows)
+    echo(f"menu items: {counts['menu_items']}")
+
+    _insert(Event, (
+        {'id': i, 'title': f'Event {i}', 'description': f'Synthetic event number {i}',
+         'event_date': start + timedelta(days=rng.uniform(0, days * 1.5)), 'event_time': '7:00 PM - 10:00 PM',
+         'image_url': '', 'is_active': rng.random() < 0.8, 'special_menu_items': '', 'created_by': 1,
+         'created_at': start, 'updated_at': start}
+        for i in range(1, counts['events'] + 1)
+    ))
+    echo(f"events: {counts['events']}")
+
+    _insert(InventoryItem, (
+        {'id': i, 'name': f'Ingredient {i}', 'description': '', 'category': rng.choice(INVENTORY_CATEGORIES),
+         'unit': rng.choice(UNITS), 'current_stock': round(rng.uniform(0, 200), 2),
+         'minimum_stock': round(rng.uniform(5, 40), 2), 'unit_cost': round(rng.uniform(0.5, 30), 2),
+         'supplier_name': f'Supplier {i % 20}', 'supplier_contact': '', 'last_restocked': None,
+         'created_at': start, 'updated_at': start}
+        for i in range(1, counts['inventory_items'] + 1)
+    ))
+    recipe_rows = []
+    for menu_item_id in range(1, counts['menu_items'] + 1):
+        ingredients = rng.sample(range(1, counts['inventory_items'] + 1), min(3, counts['inventory_items']))
+        recipe_rows.extend(
+            {'menu_item_id': menu_item_id, 'inventory_item_id': item_id, 'quantity': round(rng.uniform(0.05, 0.5), 3)}
+            for item_id in ingredients
+        )
+    _insert(RecipeIngredient, recipe_rows)
+    StockSnapshot.take_all(start)
+    db.session.commit()
+    echo(f"inventory items: {counts['inventory_items']} (with recipes and an opening snapshot)")
+
+    _insert(StockMovement, (
+        {'inventory_item_id': rng.randint(1, counts['inventory_items']),
+         'movement_type': rng.choices(MOVEMENT_TYPES, MOVEMENT_TYPE_WEIGHTS)[0],
+         'quantity': round(rng.uniform(0.1, 20), 2), 'reason': 'Synthetic movement',
+         'performed_by': rng.randint(1, counts['users']), 'created_at': moved_at}
+        for moved_at in _timestamps(rng, counts['movements'], start, now)
+    ))
+    echo(f"stock movements: {counts['movements']}")
+
+    orders, lines, line_count = [], [], 0
+    for order_id, placed_at in enumerate(_timestamps(rng, counts['orders'], start, now), start=1):
+        items = []
+        for menu_item_id in rng.sample(range(1, counts['menu_items'] + 1), min(rng.randint(1, 4), counts['menu_items'])):
+            quantity = rng.randint(1, 3)
+            price = menu_prices[menu_item_id]
+            items.append({'menu_item_id': menu_item_id, 'name': f'Dish {menu_item_id}', 'price': price,
+                          'quantity': quantity, 'total': round(price * quantity, 2)})
+        orders.append({
+            'id': order_id, 'customer_name': f'Customer {rng.randint(1, 50_000)}',
+            'customer_email': '', 'customer_phone': '', 'order_items': json.dumps(items),
+            'total_amount': round(sum(item['total'] for item in items), 2),
+            'status': rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0],
+            'order_type': rng.choice(ORDER_TYPES), 'special_instructions': '',
+            'created_at': placed_at, 'updated_at': placed_at
+        })
+        lines.extend({'order_id': order_id, **item} for item in items)
+        if len(orders) == CHUNK_SIZE or order_id == counts['orders']:
+            db.session.execute(Order.__table__.insert(), orders)
+            db.session.execute(OrderLine.__table__.insert(), lines)
+            db.session.commit()
+            line_count += len(lines)
+            orders, lines = [], []
+    echo(f"orders: {counts['orders']} ({line_count} lines)")
+
+    if db.session.get_bind(mapper=Order.__mapper__).dialect.name == 'postgresql':
+        # Rows were inserted with explicit ids; move the id sequences past them
+        for model in (User, MenuItem, Event, InventoryItem, Order):
+            table = model.__tablename__
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), (SELECT MAX(id) FROM \"{table}\"))"
+            ))
+        db.session.commit()
+
+    echo(f'sales rollup buckets: {rebuild_sales_rollup()}')
+    echo(f'seeded in {time.perf_counter() - started:.1f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill an empty database with seeded synthetic data.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--days', type=int, default=180, help='history length for orders and movements')
+    for name in SCALES['small']:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=f'override the number of {name}')
+    args = parser.parse_args()
+    counts = {name: getattr(args, name) or default for name, default in SCALES[args.scale].items()}
+
+    from src.main import app
+    from src.migrations import upgrade
+    with app.app_context():
+        upgrade()
+        generate(counts, seed=args.seed, days=args.days)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Concurrent write throughput against SQLite, default settings vs. the src/db_config.py profile.
+
+Starts several writer processes (like gunicorn workers) and reader processes
+against a scratch database. Each writer commits small transactions that
+insert an order row and bump a counter row, the same shape as order creation.
+Prints one JSON object per profile with commits per second and the number
+of "database is locked" failures.
+
+    python benchmarks/write_throughput.py --writers 4 --readers 2 --transactions 500
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from src.db_config import configure_engines, engine_options
+
+SCHEMA = [
+    'CREATE TABLE bench_order (id INTEGER PRIMARY KEY, status VARCHAR(20), total_amount FLOAT, created_at TIMESTAMP)',
+    'CREATE TABLE bench_counter (status VARCHAR(20) PRIMARY KEY, order_count INTEGER, revenue FLOAT)',
+    "INSERT INTO bench_counter VALUES ('pending', 0, 0)",
+]
+
+
+def make_engine(url, tuned):
+    if not tuned:
+        # What the app used before: pysqlite defaults, rollback journal, synchronous=FULL
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    configure_engines([engine])
+    return engine
+
+
+def writer(url, tuned, transactions, results):
+    engine = make_engine(url, tuned)
+    committed = locked = 0
+    for i in range(transactions):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "INSERT INTO bench_order (status, total_amount, created_at) "
+                    "VALUES ('pending', :amount, CURRENT_TIMESTAMP)"
+                ), {'amount': 10 + i % 7})
+                conn.execute(text(
+                    "UPDATE bench_counter SET order_count = order_count + 1, revenue = revenue + :amount "
+                    "WHERE status = 'pending'"
+                ), {'amount': 10 + i % 7})
+            committed += 1
+        except OperationalError:
+            locked += 1
+    results.put((committed, locked))
+
+
+def reader(url, tuned, stop):
+    engine = make_engine(url, tuned)
+    while not stop.is_set():
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT status, COUNT(*), SUM(total_amount) FROM bench_order GROUP BY status')).all()
+        except OperationalError:
+            pass
+
+
+def run(tuned, writers, readers, transactions):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        setup = make_engine(url, tuned)
+        with setup.begin() as conn:
+            for statement in SCHEMA:
+                conn.execute(text(statement))
+        setup.dispose()
+
+        results = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        reader_procs = [multiprocessing.Process(target=reader, args=(url, tuned, stop)) for _ in range(readers)]
+        writer_procs = [
+            multiprocessing.Process(target=writer, args=(url, tuned, transactions, results))
+            for _ in range(writers)
+        ]
+        for proc in reader_procs:
+            proc.start()
+        started = time.perf_counter()
+        for proc in writer_procs:
+            proc.start()
+        outcomes = [results.get() for _ in writer_procs]
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for proc in writer_procs + reader_procs:
+            proc.join()
+
+    committed = sum(c for c, _ in outcomes)
+    return {
+        'profile': 'tuned' if tuned else 'default',
+        'writers': writers,
+        'readers': readers,
+        'committed': committed,
+        'locked_errors': sum(l for _, l in outcomes),
+        'seconds': round(elapsed, 3),
+        'commits_per_second': round(committed / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--transactions', type=int, default=500, help='transactions per writer')
+    args = parser.parse_args()
+    for tuned in (False, True):
+        print(json.dumps(run(tuned, args.writers, args.readers, args.transactions)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+from flask import current_app, jsonify, session
+from src.models.user import User, db
+from src.cache import SharedVersion, VersionedCache
+from src.replica import primary_reads
+from functools import wraps
+
+# user id -> (role, is_active), so role checks do not cost a database round trip per request
+_user_access = None
+
+
+def _access_cache():
+    global _user_access
+    if _user_access is None:
+        _user_access = VersionedCache(
+            SharedVersion('users'),
+            maxsize=current_app.config.get('AUTH_CACHE_SIZE', 1024),
+            ttl=current_app.config.get('AUTH_CACHE_TTL', 60)
+        )
+    return _user_access
+
+
+def get_user_access(user_id):
+    """Return ``(role, is_active)`` for a user, or None if the user does not exist."""
+    cache = _access_cache()
+    cache.sync()
+    access = cache.get(user_id)
+    if access is None:
+        # Access checks read the primary so a lagging replica cannot keep a deactivated user signed in
+        with primary_reads():
+            row = db.session.query(User.role, User.is_active).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        access = (row.role, row.is_active)
+        cache.set(user_id, access)
+    return access
+
+
+def invalidate_user(user_id):
+    """Forget a user's cached role in this worker and every other one; call after changing the user."""
+    _access_cache().invalidate(user_id)
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Authentication required'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def roles_required(roles, message):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if 'user_id' not in session:
+                return jsonify({'error': 'Authentication required'}), 401
+            access = get_user_access(session['user_id'])
+            if not access or access[0] not in roles or not access[1]:
+                return jsonify({'error': message}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+admin_required = roles_required(('admin',), 'Admin access required')
+chef_or_admin_required = roles_required(('admin', 'chef'), 'Chef or admin access required')
@@ -0,0 +1,233 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request
+from src.replica import primary_reads
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is offered instead
+    brotli = None
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU mapping whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedVersion:
+    """A version marker shared by every worker process on the host.
+
+    ``bump()`` atomically replaces a small file under SHARED_STATE_DIR; other
+    workers notice with a single ``stat`` call in ``current()`` and drop
+    whatever they cached under the old version.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _path(self):
+        directory = current_app.config['SHARED_STATE_DIR']
+        return os.path.join(directory, f'{self.name}.version')
+
+    def current(self):
+        try:
+            stat = os.stat(self._path())
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def bump(self):
+        """Move the version on; returns the new version as ``current()`` will report it."""
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(uuid.uuid4().hex)
+        # A rename keeps inode, mtime and size, so this is exactly what was installed
+        # even if another worker bumps again straight after
+        stat = os.stat(temp_path)
+        os.replace(temp_path, path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class VersionedCache(TTLCache):
+    """TTLCache that empties itself whenever a SharedVersion moves on."""
+
+    def __init__(self, version, maxsize=1024, ttl=60):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.version = version
+        self._seen_version = _MISSING
+
+    def sync(self):
+        """Check the shared version and drop stale entries; call before reading."""
+        current = self.version.current()
+        if current != self._seen_version:
+            self.clear()
+            self._seen_version = current
+
+    def invalidate(self, key=_MISSING):
+        """Drop ``key`` (or everything) here and tell the other workers to do the same."""
+        if key is _MISSING:
+            self.clear()
+        else:
+            self.pop(key)
+        self.version.bump()
+
+
+def preferred_encoding(available):
+    """The best of ``available`` content codings ('br', 'gzip') the client accepts, or None."""
+    return next((name for name in ('br', 'gzip') if name in available and request.accept_encodings[name]), None)
+
+
+class ResponseCache:
+    """Caches whole GET responses of public views, shared-invalidated by name.
+
+    Entries are keyed by endpoint, URL arguments and query string, and carry a
+    strong ETag taken from the body, so every worker hands out the same tag
+    for the same data and ``If-None-Match`` requests get a 304. Views that
+    change the data call ``invalidate()`` after committing; entries also
+    expire after RESPONSE_CACHE_TTL seconds, which bounds how long
+    time-dependent results (such as upcoming events) can lag. Entries are
+    built from the primary database even when the request reads from a
+    replica.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.version = SharedVersion(f'responses-{name}')
+        self._cache = None
+
+    def _entries(self):
+        if self._cache is None:
+            self._cache = VersionedCache(
+                self.version,
+                maxsize=current_app.config.get('RESPONSE_CACHE_SIZE', 256),
+                ttl=current_app.config.get('RESPONSE_CACHE_TTL', 300)
+            )
+        return self._cache
+
+    def cached(self, f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = self._entries()
+            cache.sync()
+            key = (request.endpoint, tuple(sorted(kwargs.items())),
+                   tuple(sorted(request.args.items(multi=True))))
+            entry = cache.get(key)
+            if entry is None:
+                # The entry is served to every client for up to the TTL, so build it from
+                # the primary: a lagging replica would pin a stale body in the cache
+                with primary_reads():
+                    response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                # Keep the view's own headers (such as X-Next-Cursor); length and type are set again
+                headers = [(name, value) for name, value in response.headers
+                           if name not in ('Content-Type', 'Content-Length')]
+                entry = (body, response.mimetype, headers, hashlib.sha256(body).hexdigest())
+                cache.set(key, entry)
+            body, mimetype, headers, etag = entry
+            response = current_app.response_class(body, mimetype=mimetype, headers=headers)
+            response.set_etag(etag)
+            response.cache_control.no_cache = True  # browsers may keep it but must revalidate
+            return response.make_conditional(request)
+        return decorated_function
+
+    def invalidate(self):
+        """Drop every cached response here and in the other workers."""
+        self._entries().invalidate()
+
+
+class CompressedSnapshot:
+    """One response body built from the database and kept ready-compressed in memory.
+
+    ``build()`` returns the JSON-serializable payload. It runs again only when
+    one of ``versions`` (SharedVersion objects) moves on or after ``ttl``
+    seconds; in between, every request is served the stored gzip (or brotli)
+    bytes as they are, with a strong ETag per encoding.
+    """
+
+    def __init__(self, build, versions, ttl=300):
+        self.build = build
+        self.versions = versions
+        self.ttl = ttl
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry, state):
+        return entry is not None and entry['state'] == state and entry['expires_at'] >= time.monotonic()
+
+    def _current(self):
+        state = tuple(version.current() for version in self.versions)
+        entry = self._entry
+        if self._fresh(entry, state):
+            return entry
+        with self._lock:  # one thread rebuilds, the rest wait for its result
+            entry = self._entry
+            if not self._fresh(entry, state):
+                with primary_reads():  # kept for everyone, so never from a lagging replica
+                    payload = self.build()
+                body = current_app.json.dumps(payload, separators=(',', ':')).encode('utf-8')
+                digest = hashlib.sha256(body).hexdigest()
+                bodies = {None: (body, digest), 'gzip': (gzip.compress(body, 9, mtime=0), f'{digest}-gz')}
+                if brotli is not None:
+                    bodies['br'] = (brotli.compress(body), f'{digest}-br')
+                entry = {'state': state, 'expires_at': time.monotonic() + self.ttl, 'bodies': bodies}
+                self._entry = entry
+        return entry
+
+    def response(self):
+        bodies = self._current()['bodies']
+        encoding = preferred_encoding(bodies)
+        body, etag = bodies[encoding]
+        response = current_app.response_class(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
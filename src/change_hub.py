@@ -0,0 +1,87 @@
+import itertools
+import json
+import queue
+import threading
+from src.cache import SharedVersion
+
+
+class Subscription:
+    """One connected listener: a bounded queue of encoded events."""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def get(self, timeout):
+        """Next encoded event, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeHub:
+    """In-process fan-out of change notifications to Server-Sent Events listeners.
+
+    Blueprints publish after they commit. Each event is encoded once and the
+    same frame is handed to every subscriber, so the cost of a change does not
+    depend on how many dashboards are open. A subscriber that stops reading
+    is marked as overflowed instead of blocking the publisher, and should
+    reload its state.
+
+    Events only reach subscribers in the publishing process. Every publish
+    also bumps a SharedVersion marker; when ``sync()`` finds that another
+    worker moved it, every local subscriber is marked as overflowed too, so
+    dashboards connected here reload instead of silently missing the change.
+    """
+
+    def __init__(self, max_queue=256, version_name='dashboard-changes'):
+        self._max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.version = SharedVersion(version_name)
+        self._seen_version = None
+
+    def _resync_all(self):
+        for subscription in self._subscribers:
+            subscription.overflowed = True
+
+    def sync(self):
+        """Mark every subscriber for a reload if another worker published since the last check.
+
+        Costs one ``stat``; stream loops call it every few seconds.
+        """
+        current = self.version.current()
+        with self._lock:
+            if current != self._seen_version:
+                self._seen_version = current
+                self._resync_all()
+
+    def subscribe(self):
+        subscription = Subscription(self._max_queue)
+        # Changes from before this subscriber connected are already in what it loaded
+        self.sync()
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        frame = f'id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+        # Pick up other workers' changes first so our own bump does not hide them
+        self.sync()
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._seen_version = self.version.bump()
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(frame)
+            except queue.Full:
+                subscription.overflowed = True
+
+
+hub = ChangeHub()
@@ -0,0 +1,148 @@
+"""WSGI middleware that gzip- or brotli-compresses responses the client accepts compressed.
+
+Responses with a known length are compressed in one piece once they reach
+``min_size`` bytes. Streamed responses (no Content-Length, such as the NDJSON
+order export) are compressed as they are produced, with a sync flush every
+STREAM_FLUSH_SIZE bytes of input so the client can decode what it has
+received so far.
+Responses that are already encoded, event streams, and types that do not
+compress well are passed through untouched.
+"""
+import zlib
+from itertools import chain
+from werkzeug.datastructures import Accept, Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip is offered then
+    brotli = None
+
+STREAM_FLUSH_SIZE = 16 * 1024
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript',
+                      'text/html', 'text/css', 'text/plain', 'text/javascript', 'text/csv')
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size=1024, level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+
+    def _encoding(self, environ):
+        accept = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''), Accept)
+        if brotli is not None and accept['br']:
+            return 'br'
+        if accept['gzip']:
+            return 'gzip'
+        return None
+
+    def _compressor(self, encoding):
+        return _Brotli(self.brotli_quality) if encoding == 'br' else _Gzip(self.level)
+
+    def _should_compress(self, status, headers):
+        code = int(status.split(None, 1)[0])
+        if not 200 <= code < 300 or code in (204, 206) or 'Content-Encoding' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip()
+        if mimetype not in COMPRESSIBLE_TYPES:  # also rules out text/event-stream
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = self._encoding(environ)
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        state = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            state.update(status=status, headers=Headers(headers), exc_info=exc_info, body=[])
+            # Data passed to the legacy write() callable is sent ahead of the returned body
+            return state['body'].append
+
+        body = self.app(environ, capture_start_response)
+        status, headers = state['status'], state['headers']
+        if not self._should_compress(status, headers):
+            start_response(status, headers.to_wsgi_list(), state['exc_info'])
+            # Hand back the original iterable so wsgi.file_wrapper and close() still work
+            return self._closing(chain(state['body'], body), body) if state.get('body') else body
+
+        headers['Content-Encoding'] = encoding
+        vary = headers.get('Vary')
+        headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # The compressed bytes differ from what the strong tag names; weak
+            # tags still match If-None-Match, so 304s keep working
+            headers['ETag'] = f'W/{etag}'
+
+        if 'Content-Length' in headers:
+            compressor = self._compressor(encoding)
+            try:
+                data = b''.join(compressor.compress(chunk) for chunk in chain(state['body'], body))
+                data += compressor.finish()
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            headers['Content-Length'] = str(len(data))
+            start_response(status, headers.to_wsgi_list(), state['exc_info'])
+            return [data]
+
+        start_response(status, headers.to_wsgi_list(), state['exc_info'])
+        return self._closing(self._stream(self._compressor(encoding), chain(state['body'], body)), body)
+
+    @staticmethod
+    def _closing(chunks, body):
+        try:
+            yield from chunks
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    @staticmethod
+    def _stream(compressor, chunks):
+        pending = 0
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_SIZE:
+                # A sync flush per small chunk would ruin the ratio; flushing every
+                # few KiB still gets data to the client while the rest is produced
+                data += compressor.flush()
+                pending = 0
+            if data:
+                yield data
+        yield compressor.finish()
@@ -0,0 +1,81 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+APP_DIR = os.path.dirname(__file__)
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def database_url(env_name, default_file):
+    """Database URL from ``env_name``, or a SQLite file under src/database.
+
+    Relative SQLite paths such as ``sqlite:///database/app.db`` resolve against
+    src/, so the documented default keeps pointing at the existing database.
+    """
+    value = os.environ.get(env_name)
+    if not value:
+        return f"sqlite:///{os.path.join(APP_DIR, 'database', default_file)}"
+    # Heroku and others still hand out the old postgres:// scheme, which SQLAlchemy no longer accepts
+    if value.startswith('postgres://'):
+        value = 'postgresql://' + value[len('postgres://'):]
+    url = make_url(value)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+            and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(APP_DIR, url.database))
+        return url.render_as_string(hide_password=False)
+    return value
+
+
+def engine_options(url):
+    """create_engine() keyword arguments suited to the backend behind ``url``."""
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        # Seconds pysqlite waits on a locked database; kept in step with the busy_timeout pragma
+        return {'connect_args': {'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}}
+    if backend == 'postgresql':
+        return {
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+            # Test pooled connections before use so a database restart does not fail requests
+            'pool_pre_ping': True
+        }
+    return {}
+
+
+def sqlite_pragmas():
+    """Pragmas run on every new SQLite connection.
+
+    WAL lets readers carry on while one writer commits, busy_timeout makes
+    writers wait for the lock instead of failing with "database is locked",
+    and synchronous=NORMAL is safe under WAL while skipping an fsync per commit.
+    """
+    return [
+        ('journal_mode', 'WAL'),
+        ('busy_timeout', _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        ('synchronous', os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('mmap_size', _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negative values are KiB rather than pages
+        ('cache_size', _env_int('SQLITE_CACHE_SIZE', -64000)),
+    ]
+
+
+def configure_engines(engines):
+    """Install the SQLite pragmas on every SQLite engine; call before the first connection."""
+    pragmas = sqlite_pragmas()
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', set_pragmas)
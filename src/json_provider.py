@@ -0,0 +1,48 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with compact responses encoded by orjson when it is installed.
+
+    Produces the same bytes as the stdlib path: keys sorted, no spaces, dates
+    and other extra types handed to Flask's ``default``. Output containing
+    non-ASCII text, and anything orjson cannot encode, goes through the stdlib
+    encoder so escaping stays identical. (orjson spells float exponents
+    differently, e.g. ``1e16`` for ``1e+16``; values that small or large do not
+    occur in this API.) Indented debug output always uses the stdlib encoder.
+    """
+
+    def _orjson_dumps(self, obj):
+        if orjson is None:
+            return None
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        try:
+            data = orjson.dumps(obj, default=self.default, option=options)
+        except TypeError:
+            return None
+        if self.ensure_ascii and not data.isascii():
+            return None
+        return data
+
+    def dumps(self, obj, **kwargs):
+        if kwargs == {'separators': (',', ':')}:
+            data = self._orjson_dumps(obj)
+            if data is not None:
+                return data.decode('ascii' if self.ensure_ascii else 'utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        data = self._orjson_dumps(obj)
+        if data is None:
+            data = super().dumps(obj, separators=(',', ':')).encode('utf-8')
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
@@ -3,55 +3,140 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
+from src.compression import CompressionMiddleware
 from src.models.user import db
+from src.db_config import database_url, engine_options, configure_engines
 from src.models.menu import MenuItem
 from src.models.event import Event
-from src.models.inventory import InventoryItem, StockMovement
-from src.models.order import Order
+from src.models.inventory import InventoryItem, StockMovement, StockSnapshot
+from src.models.order import Order, OrderLine, IdempotencyKey, ArchivedOrder
+from src.models.recipe import RecipeIngredient, OrderStockDeduction
+from src.models.stats import OrderStatusCounter, SalesRollup
 from src.routes.user import user_bp
 from src.routes.menu import menu_bp
 from src.routes.event import event_bp
+from src.routes.customer import customer_bp
 from src.routes.inventory import inventory_bp
 from src.routes.order import order_bp
+from src.routes.report import report_bp
+from src.routes.stream import stream_bp
+from src.routes.metrics import metrics_bp
+from src.migrations import db_cli, upgrade
+from src.replica import REPLICA_BIND, init_read_replica
+from src.metrics import init_metrics
+from src.json_provider import FastJSONProvider
+from src.static_assets import StaticAssets
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+# Compact JSON responses are encoded with orjson when it is installed (same bytes as the stdlib)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+# Small marker files used to tell every gunicorn worker on this host that cached data changed
+app.config['SHARED_STATE_DIR'] = os.environ.get('SHARED_STATE_DIR', os.path.join(os.path.dirname(__file__), 'database'))
+# Seconds a cached public menu/event response may be served before it is rebuilt anyway
+app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', '300'))
+
+# Password hashing runs on a small bounded pool; logins beyond workers + queue in this process,
+# or beyond PASSWORD_HASH_HOST_LIMIT across every worker on the host, get a 503.
+# Changing the method (e.g. more pbkdf2 iterations) upgrades each hash at its owner's next login.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', '8'))
+app.config['PASSWORD_HASH_HOST_LIMIT'] = int(os.environ.get('PASSWORD_HASH_HOST_LIMIT', '8'))
+# Failed logins allowed per username / per client address within the window (seconds)
+app.config['LOGIN_MAX_FAILURES'] = int(os.environ.get('LOGIN_MAX_FAILURES', '5'))
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', '20'))
+app.config['LOGIN_THROTTLE_WINDOW'] = int(os.environ.get('LOGIN_THROTTLE_WINDOW', '900'))
+
+# Behind nginx, take the client address from X-Forwarded-For so login throttling sees real clients
+trusted_proxies = int(os.environ.get('TRUSTED_PROXY_COUNT', '0'))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
+# Compress JSON and other text responses of at least COMPRESSION_MIN_SIZE bytes for clients that accept it
+app.wsgi_app = CompressionMiddleware(
+    app.wsgi_app,
+    min_size=int(os.environ.get('COMPRESSION_MIN_SIZE', '1024')),
+    level=int(os.environ.get('COMPRESSION_LEVEL', '6')),
+    brotli_quality=int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+)
 
 # Enable CORS for all routes
-CORS(app, origins="*")
+CORS(app, origins="*", expose_headers=["X-Next-Cursor"])
 
 # Register all blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(menu_bp, url_prefix='/api')
 app.register_blueprint(event_bp, url_prefix='/api')
+app.register_blueprint(customer_bp, url_prefix='/api')
 app.register_blueprint(inventory_bp, url_prefix='/api')
 app.register_blueprint(order_bp, url_prefix='/api')
+app.register_blueprint(report_bp, url_prefix='/api')
+app.register_blueprint(stream_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp, url_prefix='/api')
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# Database configuration: DATABASE_URL (and ARCHIVE_DATABASE_URL) select the backend,
+# src/db_config.py tunes SQLite pragmas or the PostgreSQL connection pool to match
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url('DATABASE_URL', 'app.db')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Completed and cancelled orders are moved here by `flask --app src.main order archive`
+archive_url = database_url('ARCHIVE_DATABASE_URL', 'archive.db')
+app.config['SQLALCHEMY_BINDS'] = {
+    'archive': {'url': archive_url, **engine_options(archive_url)}
+}
+app.config['ORDER_ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', '90'))
+
+# Optional read replica: GET requests to the menu, event and order APIs read from it,
+# except for clients that wrote something within the last READ_REPLICA_STICKY_SECONDS
+if os.environ.get('READ_REPLICA_URL'):
+    replica_url = database_url('READ_REPLICA_URL', None)
+    app.config['SQLALCHEMY_BINDS'][REPLICA_BIND] = {'url': replica_url, **engine_options(replica_url)}
+app.config['READ_REPLICA_STICKY_SECONDS'] = int(os.environ.get('READ_REPLICA_STICKY_SECONDS', '5'))
+init_read_replica(app, menu_bp, event_bp, customer_bp, order_bp)
+
+# Serve /api/orders/stats from incrementally maintained counters instead of an aggregate query.
+# After turning this on for an existing database, seed the counters once with:
+#   flask --app src.main order rebuild-stats
+app.config['ORDER_STATS_COUNTERS'] = os.environ.get('ORDER_STATS_COUNTERS', 'false').lower() == 'true'
+
+# Per-endpoint query counts and latency, scraped from /api/_metrics with METRICS_TOKEN as a bearer token
+# (the endpoint is off while it is unset). Workers write their numbers to SHARED_STATE_DIR every
+# METRICS_FLUSH_SECONDS so a scrape reports the whole host.
+# In debug mode, requests running more SQL statements than the threshold are logged as warnings.
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+app.config['METRICS_FLUSH_SECONDS'] = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+app.config['SQL_QUERY_WARN_THRESHOLD'] = int(os.environ.get('SQL_QUERY_WARN_THRESHOLD', '20'))
 db.init_app(app)
 with app.app_context():
-    db.create_all()
+    configure_engines(db.engines.values())
+    init_metrics(app, db.engines.values())
+# Schema changes are applied by `flask --app src.main db upgrade`, never by workers on boot
+app.cli.add_command(db_cli)
+
+# Static files are fingerprinted and precompressed once at startup and served from the manifest
+static_assets = StaticAssets(
+    app.static_folder,
+    os.environ.get('STATIC_BUILD_DIR', os.path.join(os.path.dirname(__file__), 'static_build'))
+)
+static_assets.build()
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'customer.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'customer.html')
-        else:
-            return "index.html not found", 404
+    asset = static_assets.find(path) or static_assets.find('customer.html')
+    if asset is None:
+        return "customer.html not found", 404
+    return asset.response()
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5002, debug=True)
+    # The development server brings its own database up to date
+    with app.app_context():
+        upgrade()
+    # Restart (and so rebuild the static assets) when a static file changes
+    app.run(host='0.0.0.0', port=5002, debug=True,
+            extra_files=[source for _, source in static_assets.source_files()])
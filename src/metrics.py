@@ -0,0 +1,243 @@
+"""Per-endpoint request and SQL metrics, rendered in the Prometheus text format.
+
+Every query run by SQLAlchemy during a request is counted and timed through
+cursor-execute events. Each request then records its latency, query count and
+total SQL time under its blueprint, URL rule and method.
+
+Each worker process keeps its own numbers and writes them every
+METRICS_FLUSH_SECONDS to a file of its own under SHARED_STATE_DIR/metrics. A
+scrape, whichever worker answers it, adds up every file on the host, so the
+series it reports are host-wide totals and ``rate()`` stays meaningful.
+Files of workers that have exited are kept, so totals never go down while the
+service is running.
+"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+class RequestMetrics:
+    """Thread-safe store of request counters and histograms, keyed by endpoint labels."""
+
+    HISTOGRAMS = (
+        ('http_request_duration_seconds', 'Request latency in seconds.', LATENCY_BUCKETS),
+        ('db_queries_per_request', 'SQL statements executed per request.', QUERY_COUNT_BUCKETS),
+        ('db_time_per_request_seconds', 'Time spent executing SQL per request, in seconds.', LATENCY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._queries = {}
+        self._histograms = {name: {} for name, _, _ in self.HISTOGRAMS}
+        self._flusher = None
+        self._dirty = False
+
+    def record(self, endpoint, status, seconds, queries, sql_seconds):
+        """Record one request; ``endpoint`` is a tuple of (label, value) pairs."""
+        with self._lock:
+            key = endpoint + (('status', status),)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            count, total = self._queries.get(endpoint, (0, 0))
+            self._queries[endpoint] = (count + queries, total + sql_seconds)
+            for (name, _, buckets), value in zip(self.HISTOGRAMS, (seconds, queries, sql_seconds)):
+                series = self._histograms[name]
+                if endpoint not in series:
+                    series[endpoint] = Histogram(buckets)
+                series[endpoint].observe(value)
+            self._dirty = True
+
+    def snapshot(self):
+        """This process's numbers as a JSON-serializable dict, the format of the shared files."""
+        with self._lock:
+            return {
+                'requests': [[key, value] for key, value in self._requests.items()],
+                'queries': [[key, count, total] for key, (count, total) in self._queries.items()],
+                'histograms': {name: [[key, histogram.counts, histogram.sum, histogram.count]
+                                      for key, histogram in series.items()]
+                               for name, series in self._histograms.items()},
+            }
+
+    def flush(self, directory):
+        """Write this process's snapshot to its file in ``directory``, replacing the previous one."""
+        with self._lock:
+            self._dirty = False
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(directory, exist_ok=True)
+        with open(temp_path, 'w') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    def start_flushing(self, directory, interval):
+        """Flush every ``interval`` seconds from a daemon thread while there is something new."""
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, args=(directory, interval),
+                                             name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self, directory, interval):
+        while True:
+            time.sleep(interval)
+            if self._dirty:
+                try:
+                    self.flush(directory)
+                except OSError:
+                    pass  # try again next time; a scrape meanwhile reports the last file written
+
+    @staticmethod
+    def combine(snapshots):
+        """Add up snapshots into (requests, queries, histograms) keyed by label tuples."""
+        def labels(key):
+            return tuple(tuple(pair) for pair in key)
+
+        requests, queries, histograms = {}, {}, {name: {} for name, _, _ in RequestMetrics.HISTOGRAMS}
+        for snapshot in snapshots:
+            for key, value in snapshot['requests']:
+                key = labels(key)
+                requests[key] = requests.get(key, 0) + value
+            for key, count, total in snapshot['queries']:
+                key = labels(key)
+                previous_count, previous_total = queries.get(key, (0, 0))
+                queries[key] = (previous_count + count, previous_total + total)
+            for name, _, buckets in RequestMetrics.HISTOGRAMS:
+                for key, counts, total, count in snapshot['histograms'].get(name, ()):
+                    key = labels(key)
+                    histogram = histograms[name].get(key)
+                    if histogram is None:
+                        histogram = histograms[name][key] = Histogram(buckets)
+                    histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                    histogram.sum += total
+                    histogram.count += count
+        return requests, queries, histograms
+
+    def render(self, directory=None):
+        """Prometheus text for this process, or with ``directory`` for every process that wrote a file there."""
+        if directory is None:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(directory)  # our own file is then current
+            snapshots = []
+            for path in glob.glob(os.path.join(directory, '*.json')):
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # a worker's file vanished or was cleared
+        requests, queries, histograms = self.combine(snapshots)
+
+        lines = ['# HELP http_requests_total Requests handled.', '# TYPE http_requests_total counter']
+        lines += [f'http_requests_total{{{_labels(key)}}} {value}' for key, value in requests.items()]
+        lines += ['# HELP db_queries_total SQL statements executed.', '# TYPE db_queries_total counter']
+        lines += [f'db_queries_total{{{_labels(key)}}} {count}' for key, (count, _) in queries.items()]
+        lines += ['# HELP db_query_seconds_total Time spent executing SQL, in seconds.',
+                  '# TYPE db_query_seconds_total counter']
+        lines += [f'db_query_seconds_total{{{_labels(key)}}} {total:.6f}' for key, (_, total) in queries.items()]
+        for name, help_text, _ in self.HISTOGRAMS:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for key, histogram in histograms[name].items():
+                labels = _labels(key)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RequestMetrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_app_context():
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_stats = [0, 0.0]
+
+
+def _finish_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    queries, sql_seconds = g.sql_stats
+    endpoint = (
+        ('blueprint', request.blueprint or ''),
+        ('rule', request.url_rule.rule if request.url_rule else '<unmatched>'),
+        ('method', request.method),
+    )
+    metrics.record(endpoint, response.status_code, time.perf_counter() - started, queries, sql_seconds)
+    metrics.start_flushing(metrics_directory(), current_app.config.get('METRICS_FLUSH_SECONDS', 5))
+
+    threshold = current_app.config.get('SQL_QUERY_WARN_THRESHOLD', 20)
+    if current_app.debug and queries > threshold:
+        current_app.logger.warning('%s %s ran %d SQL queries (threshold %d)',
+                                   request.method, request.endpoint, queries, threshold)
+    return response
+
+
+def metrics_directory():
+    """Where every worker on the host writes its metrics file."""
+    return os.path.join(current_app.config['SHARED_STATE_DIR'], 'metrics')
+
+
+def init_metrics(app, engines):
+    """Count and time SQL on ``engines`` and record every request of ``app``."""
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,170 @@
+"""Versioned schema migrations, applied with ``flask --app src.main db upgrade``.
+
+Each migration runs once and is recorded in the schema_version table of the
+main database. Workers never run DDL; deploy by running the upgrade first and
+then restarting gunicorn. New migrations go at the end of MIGRATIONS and must
+be safe to re-run against a schema that already has the change, because
+migration 1 builds a fresh database straight from the current models.
+"""
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select
+from sqlalchemy.schema import CreateIndex, CreateTable
+from src.models.user import db
+from src.models.order import ArchivedOrder, ArchivedOrderLine, Order
+from src.routes.order import backfill_order_lines, rebuild_sales_rollup
+
+db_cli = AppGroup('db', help='Database schema migrations.')
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def create_tables():
+    # Creates only the tables that are missing, so databases made before migrations existed keep their data
+    for bind_key in db.metadatas:
+        db.metadatas[bind_key].create_all(db.engines[bind_key])
+
+
+def create_indexes(*names):
+    """Migration step creating the named model indexes if they are not there yet.
+
+    On PostgreSQL the indexes are built CONCURRENTLY, outside a transaction, so
+    writes to the table carry on while the index is built.
+    """
+    def step():
+        for name in names:
+            bind_key, index = _find_index(name)
+            engine = db.engines[bind_key]
+            if engine.dialect.name == 'postgresql':
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.exec_driver_sql(ddl)
+            else:
+                index.create(engine, checkfirst=True)
+    return step
+
+
+def _find_index(name):
+    for bind_key, metadata in db.metadatas.items():
+        for table in metadata.tables.values():
+            for index in table.indexes:
+                if index.name == name:
+                    return bind_key, index
+    raise LookupError(f'No model declares index {name}')
+
+
+def order_ids_autoincrement():
+    """Rebuild the SQLite order table with AUTOINCREMENT so ids are never reused.
+
+    Without it SQLite gives a new order max(id) + 1, reusing the id of a
+    deleted or archived newest order. The table is copied the usual SQLite
+    way (new table, copy, drop, rename), and the id sequence starts past
+    every archived order too. PostgreSQL sequences never go back, so there
+    is nothing to do there.
+    """
+    engine = db.engines[None]
+    if engine.dialect.name != 'sqlite':
+        return
+    table = Order.__table__
+    with engine.begin() as conn:
+        table_sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'order'"
+        ).scalar()
+        if 'AUTOINCREMENT' not in table_sql.upper():
+            new_table = table.to_metadata(MetaData(), name='order__new')
+            columns = ', '.join(f'"{column.name}"' for column in table.columns)
+            conn.execute(CreateTable(new_table))
+            conn.exec_driver_sql(f'INSERT INTO order__new ({columns}) SELECT {columns} FROM "order"')
+            # Foreign keys are not enforced on these connections, so order lines survive the drop
+            conn.exec_driver_sql('DROP TABLE "order"')
+            conn.exec_driver_sql('ALTER TABLE order__new RENAME TO "order"')
+            for index in table.indexes:
+                index.create(conn)
+        with db.engines[ArchivedOrder.__bind_key__].connect() as archive:
+            archived_max = archive.execute(select(func.max(ArchivedOrder.id))).scalar() or 0
+        current = conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = 'order'").scalar()
+        if current is None:
+            conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('order', ?)", (archived_max,))
+        elif current < archived_max:
+            conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = ? WHERE name = 'order'", (archived_max,))
+
+
+def archived_order_lines(batch_size=500):
+    """Create archived_order_line and fill it from the payloads of orders archived before it existed."""
+    create_tables()
+    last_id = 0
+    while True:
+        orders = ArchivedOrder.query.filter(ArchivedOrder.id > last_id, ~ArchivedOrder.lines.any()) \
+            .order_by(ArchivedOrder.id).limit(batch_size).all()
+        if not orders:
+            break
+        last_id = orders[-1].id
+        for order in orders:
+            lines = ArchivedOrderLine.from_items(order.to_dict()['order_items'])
+            for line in lines:
+                line.order_id = order.id
+            db.session.add_all(lines)
+        db.session.commit()
+
+
+MIGRATIONS = [
+    (1, 'Create missing tables', create_tables),
+    (2, 'Index stock movements, low-stock items, order lines and recipes', create_indexes(
+        'ix_stock_movement_type_created_at', 'ix_stock_movement_item_created_at',
+        'ix_inventory_item_low_stock', 'ix_order_line_order_id', 'ix_order_line_menu_item_id',
+        'ix_recipe_ingredient_menu_item_id', 'ix_archived_order_status', 'ix_archived_order_created_at'
+    )),
+    (3, 'Copy legacy order_items JSON into order lines', backfill_order_lines),
+    (4, 'Build the hourly sales rollup', rebuild_sales_rollup),
+    (5, 'Index orders by status and date, menu items by category, events by date', create_indexes(
+        'ix_order_status_created_at', 'ix_order_created_at',
+        'ix_menu_item_available_category', 'ix_menu_item_category_name',
+        'ix_event_active_date', 'ix_event_date'
+    )),
+    (6, 'Stop SQLite from reusing order ids', order_ids_autoincrement),
+    (7, 'Copy archived order lines into archived_order_line', archived_order_lines),
+]
+
+
+def applied_versions():
+    engine = db.engines[None]
+    schema_version.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def upgrade(echo=print):
+    """Apply every migration not yet recorded; returns the versions applied."""
+    done = applied_versions()
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        echo(f'Applying {version}: {name}')
+        step()
+        db.session.execute(schema_version.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+        db.session.commit()
+        applied.append(version)
+    return applied
+
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    """Apply pending migrations."""
+    applied = upgrade(echo=click.echo)
+    click.echo(f'Applied {len(applied)} migration(s)' if applied else 'Database is up to date')
+
+
+@db_cli.command('status')
+def status_command():
+    """List migrations and whether each has been applied."""
+    done = applied_versions()
+    for version, name, _ in MIGRATIONS:
+        click.echo(f"{version:>4}  {'applied' if version in done else 'pending':<8} {name}")
@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.serialization import Projection, isoformat
 from datetime import datetime
 
 class Event(db.Model):
@@ -14,6 +15,12 @@ class Event(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Active (and upcoming) events in date order
+        db.Index('ix_event_active_date', 'is_active', 'event_date'),
+        db.Index('ix_event_date', 'event_date'),
+    )
+
     # Relationships
     creator = db.relationship('User', backref='events')
 
@@ -35,3 +42,17 @@ class Event(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+# Column-level twin of Event.to_dict() for list endpoints
+EVENT_FIELDS = Projection(
+    ('id', Event.id),
+    ('title', Event.title),
+    ('description', Event.description),
+    ('event_date', Event.event_date, isoformat),
+    ('event_time', Event.event_time),
+    ('image_url', Event.image_url),
+    ('is_active', Event.is_active),
+    ('special_menu_items', Event.special_menu_items),
+    ('created_by', Event.created_by),
+    ('created_at', Event.created_at, isoformat),
+    ('updated_at', Event.updated_at, isoformat),
+)
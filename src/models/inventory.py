@@ -1,5 +1,7 @@
 from src.models.user import db
+from sqlalchemy.ext.hybrid import hybrid_method
 from datetime import datetime
+from src.serialization import Projection, isoformat
 
 class InventoryItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -16,10 +18,51 @@ class InventoryItem(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Partial index holding only low-stock rows; the database keeps it current on every
+        # stock change, so low-stock queries read a handful of entries instead of the table.
+        db.Index('ix_inventory_item_low_stock', 'category', 'name',
+                 sqlite_where=db.text('current_stock <= minimum_stock'),
+                 postgresql_where=db.text('current_stock <= minimum_stock')),
+    )
+
     def __repr__(self):
         return f'<InventoryItem {self.name}>'
 
+    @classmethod
+    def apply_stock_movement(cls, item_id, movement_type, quantity, moved_at=None):
+        """Change an item's stock with one UPDATE statement.
+
+        The new level is computed by the database from the current row, so
+        movements logged at the same time by different workers never
+        overwrite each other. Stock never goes below zero.
+        """
+        stock = cls.current_stock
+        if movement_type == 'in':
+            values = {'current_stock': stock + quantity, 'last_restocked': moved_at or datetime.utcnow()}
+        elif movement_type == 'out':
+            values = {'current_stock': db.case((stock - quantity < 0, 0), else_=stock - quantity)}
+        elif movement_type == 'adjustment':
+            values = {'current_stock': max(quantity, 0)}
+        else:
+            raise ValueError(f'Unknown movement type: {movement_type}')
+        cls.query.filter_by(id=item_id).update(values, synchronize_session=False)
+
+    @classmethod
+    def consume_stock(cls, quantities):
+        """Take ``{item_id: quantity}`` out of stock for many items with one UPDATE statement."""
+        if not quantities:
+            return
+        stock = cls.current_stock
+        used = db.case({item_id: quantity for item_id, quantity in quantities.items()}, value=cls.id)
+        cls.query.filter(cls.id.in_(list(quantities))).update(
+            {'current_stock': db.case((stock - used < 0, 0), else_=stock - used)},
+            synchronize_session=False
+        )
+
+    @hybrid_method
     def is_low_stock(self):
+        # On the class this builds the SQL predicate, matching the partial index condition
         return self.current_stock <= self.minimum_stock
 
     def to_dict(self):
@@ -40,7 +83,27 @@ class InventoryItem(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+# Column-level twin of InventoryItem.to_dict() for list endpoints
+INVENTORY_ITEM_FIELDS = Projection(
+    ('id', InventoryItem.id),
+    ('name', InventoryItem.name),
+    ('description', InventoryItem.description),
+    ('category', InventoryItem.category),
+    ('unit', InventoryItem.unit),
+    ('current_stock', InventoryItem.current_stock),
+    ('minimum_stock', InventoryItem.minimum_stock),
+    ('unit_cost', InventoryItem.unit_cost),
+    ('supplier_name', InventoryItem.supplier_name),
+    ('supplier_contact', InventoryItem.supplier_contact),
+    ('last_restocked', InventoryItem.last_restocked, isoformat),
+    ('is_low_stock', InventoryItem.is_low_stock(), bool),
+    ('created_at', InventoryItem.created_at, isoformat),
+    ('updated_at', InventoryItem.updated_at, isoformat),
+)
+
 class StockMovement(db.Model):
+    TYPES = ('in', 'out', 'adjustment')
+
     id = db.Column(db.Integer, primary_key=True)
     inventory_item_id = db.Column(db.Integer, db.ForeignKey('inventory_item.id'), nullable=False)
     movement_type = db.Column(db.String(20), nullable=False)  # 'in', 'out', 'adjustment'
@@ -49,6 +112,13 @@ class StockMovement(db.Model):
     performed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Usage reports read one movement type over a date range
+        db.Index('ix_stock_movement_type_created_at', 'movement_type', 'created_at'),
+        # An item's history, newest first, and replays from a stock snapshot
+        db.Index('ix_stock_movement_item_created_at', 'inventory_item_id', 'created_at'),
+    )
+
     # Relationships
     inventory_item = db.relationship('InventoryItem', backref='movements')
     user = db.relationship('User', backref='stock_movements')
@@ -56,6 +126,19 @@ class StockMovement(db.Model):
     def __repr__(self):
         return f'<StockMovement {self.movement_type} {self.quantity}>'
 
+    @staticmethod
+    def replay(stock, movements):
+        """Apply ``(movement_type, quantity)`` pairs to a stock level, the same way
+        InventoryItem.apply_stock_movement does."""
+        for movement_type, quantity in movements:
+            if movement_type == 'in':
+                stock += quantity
+            elif movement_type == 'out':
+                stock = max(stock - quantity, 0)
+            elif movement_type == 'adjustment':
+                stock = max(quantity, 0)
+        return stock
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -67,3 +150,38 @@ class StockMovement(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Column-level twin of StockMovement.to_dict() for list endpoints
+STOCK_MOVEMENT_FIELDS = Projection(
+    ('id', StockMovement.id),
+    ('inventory_item_id', StockMovement.inventory_item_id),
+    ('movement_type', StockMovement.movement_type),
+    ('quantity', StockMovement.quantity),
+    ('reason', StockMovement.reason),
+    ('performed_by', StockMovement.performed_by),
+    ('created_at', StockMovement.created_at, isoformat),
+)
+
+class StockSnapshot(db.Model):
+    """An item's stock level at a point in time.
+
+    Past stock levels are worked out from the nearest earlier snapshot plus the
+    movements logged since, instead of replaying the whole ledger.
+    """
+    inventory_item_id = db.Column(db.Integer, db.ForeignKey('inventory_item.id', ondelete='CASCADE'), primary_key=True)
+    taken_at = db.Column(db.DateTime, primary_key=True)
+    stock = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<StockSnapshot {self.inventory_item_id} @ {self.taken_at}: {self.stock}>'
+
+    @classmethod
+    def take_all(cls, taken_at=None):
+        """Record the current stock of every inventory item with one INSERT ... SELECT."""
+        taken_at = taken_at or datetime.utcnow()
+        db.session.execute(
+            db.insert(cls.__table__).from_select(
+                ['inventory_item_id', 'taken_at', 'stock'],
+                db.select(InventoryItem.id, db.literal(taken_at, db.DateTime), InventoryItem.current_stock)
+            )
+        )
+        return taken_at
@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.serialization import Projection, isoformat
 from datetime import datetime
 
 class MenuItem(db.Model):
@@ -13,6 +14,13 @@ class MenuItem(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # The customer menu: available items, grouped by category and sorted by name
+        db.Index('ix_menu_item_available_category', 'is_available', 'category', 'name'),
+        # Admin listing, optionally narrowed to one category, in the same order
+        db.Index('ix_menu_item_category_name', 'category', 'name'),
+    )
+
     # Relationships
     creator = db.relationship('User', backref='menu_items')
 
@@ -33,3 +41,16 @@ class MenuItem(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+# Column-level twin of MenuItem.to_dict() for list endpoints
+MENU_ITEM_FIELDS = Projection(
+    ('id', MenuItem.id),
+    ('name', MenuItem.name),
+    ('description', MenuItem.description),
+    ('price', MenuItem.price),
+    ('category', MenuItem.category),
+    ('image_url', MenuItem.image_url),
+    ('is_available', MenuItem.is_available),
+    ('created_by', MenuItem.created_by),
+    ('created_at', MenuItem.created_at, isoformat),
+    ('updated_at', MenuItem.updated_at, isoformat),
+)
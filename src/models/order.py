@@ -1,13 +1,22 @@
 from src.models.user import db
 from datetime import datetime
+from src.serialization import Projection, isoformat
 import json
+import zlib
+
+def _legacy_order_items(order_items):
+    # Orders placed before order lines existed and not yet backfilled
+    try:
+        return json.loads(order_items) if order_items else []
+    except:
+        return []
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(100), nullable=False)
     customer_email = db.Column(db.String(120))
     customer_phone = db.Column(db.String(20))
-    order_items = db.Column(db.Text, nullable=False)  # JSON string of ordered items
+    order_items = db.Column(db.Text, nullable=False)  # JSON string of ordered items (legacy copy of lines)
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), nullable=False, default='pending')  # pending, confirmed, preparing, ready, completed, cancelled
     order_type = db.Column(db.String(20), nullable=False, default='dine_in')  # dine_in, takeaway, delivery
@@ -15,17 +24,30 @@ class Order(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Order lists filtered by status, newest first, and the status breakdowns
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+        # Unfiltered order lists, date range reports and archiving
+        db.Index('ix_order_created_at', 'created_at'),
+        # Never hand out an id again once its order is deleted or archived
+        {'sqlite_autoincrement': True},
+    )
+
+    # Relationships
+    lines = db.relationship('OrderLine', backref='order', cascade='all, delete-orphan',
+                            order_by='OrderLine.id', lazy='selectin')
+
     def __repr__(self):
         return f'<Order {self.id} - {self.customer_name}>'
 
     def get_order_items(self):
-        try:
-            return json.loads(self.order_items) if self.order_items else []
-        except:
-            return []
+        if self.lines:
+            return [line.to_dict() for line in self.lines]
+        return _legacy_order_items(self.order_items)
 
     def set_order_items(self, items):
         self.order_items = json.dumps(items)
+        self.lines = [OrderLine(**item) for item in items]
 
     def to_dict(self):
         return {
@@ -42,3 +64,143 @@ class Order(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+class OrderLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), nullable=False, index=True)
+    menu_item_id = db.Column(db.Integer, nullable=False, index=True)  # no FK: lines outlive deleted menu items
+    name = db.Column(db.String(100), nullable=False)  # name and price as charged at order time
+    price = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    total = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<OrderLine {self.order_id}: {self.quantity} x {self.name}>'
+
+    def to_dict(self):
+        return {
+            'menu_item_id': self.menu_item_id,
+            'name': self.name,
+            'price': self.price,
+            'quantity': self.quantity,
+            'total': self.total
+        }
+
+
+# Column-level twins of Order.to_dict() and OrderLine.to_dict() for list endpoints;
+# order_items holds the legacy JSON column until order_dicts() swaps in the lines
+ORDER_FIELDS = Projection(
+    ('id', Order.id),
+    ('customer_name', Order.customer_name),
+    ('customer_email', Order.customer_email),
+    ('customer_phone', Order.customer_phone),
+    ('order_items', Order.order_items),
+    ('total_amount', Order.total_amount),
+    ('status', Order.status),
+    ('order_type', Order.order_type),
+    ('special_instructions', Order.special_instructions),
+    ('created_at', Order.created_at, isoformat),
+    ('updated_at', Order.updated_at, isoformat),
+)
+
+ORDER_LINE_FIELDS = Projection(
+    ('menu_item_id', OrderLine.menu_item_id),
+    ('name', OrderLine.name),
+    ('price', OrderLine.price),
+    ('quantity', OrderLine.quantity),
+    ('total', OrderLine.total),
+)
+
+
+def order_dicts(rows, fields=ORDER_FIELDS):
+    """``Order.to_dict()`` output for rows selected with ``fields`` (ORDER_FIELDS or a subset
+    including id), loading all their lines in one query."""
+    orders = fields.to_dicts(rows)
+    if 'order_items' not in fields.keys():
+        return orders
+    lines = {}
+    if orders:
+        line_rows = db.session.query(OrderLine.order_id, *ORDER_LINE_FIELDS.columns()) \
+            .filter(OrderLine.order_id.in_([order['id'] for order in orders])) \
+            .order_by(OrderLine.id)
+        for row in line_rows:
+            lines.setdefault(row[0], []).append(ORDER_LINE_FIELDS.to_dict(row[1:]))
+    for order in orders:
+        order['order_items'] = lines.get(order['id']) or _legacy_order_items(order['order_items'])
+    return orders
+
+
+class IdempotencyKey(db.Model):
+    """Remembers which order a client-supplied Idempotency-Key produced,
+    so a retried checkout returns the original order instead of a duplicate."""
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of the request body
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} -> {self.order_id}>'
+
+
+class ArchivedOrder(db.Model):
+    """Completed or cancelled order moved out of the hot order table.
+
+    Lives in the separate archive database. Rows are only ever appended; the
+    full order document (as returned by Order.to_dict) is stored
+    zlib-compressed, with a few columns kept alongside it for lookups and stats
+    and the lines copied to archived_order_line for the item reports.
+    """
+    __bind_key__ = 'archive'
+
+    id = db.Column(db.Integer, primary_key=True)  # the original order id
+    status = db.Column(db.String(20), nullable=False, index=True)
+    order_type = db.Column(db.String(20), nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    lines = db.relationship('ArchivedOrderLine', cascade='all, delete-orphan', order_by='ArchivedOrderLine.id')
+
+    def __repr__(self):
+        return f'<ArchivedOrder {self.id}>'
+
+    @classmethod
+    def from_order(cls, order):
+        return cls(
+            id=order.id,
+            status=order.status,
+            order_type=order.order_type,
+            total_amount=order.total_amount,
+            created_at=order.created_at,
+            payload=zlib.compress(json.dumps(order.to_dict(), separators=(',', ':')).encode('utf-8'), 9),
+            lines=ArchivedOrderLine.from_items(order.get_order_items())
+        )
+
+    def to_dict(self):
+        return json.loads(zlib.decompress(self.payload))
+
+
+class ArchivedOrderLine(db.Model):
+    """A line of an archived order, so item reports can GROUP BY instead of unpacking payloads."""
+    __bind_key__ = 'archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('archived_order.id'), nullable=False, index=True)
+    menu_item_id = db.Column(db.Integer, nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    total = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<ArchivedOrderLine {self.order_id}: {self.quantity} x {self.name}>'
+
+    @classmethod
+    def from_items(cls, items):
+        """Lines for ``Order.to_dict()['order_items']``; legacy items without a menu item are left out."""
+        return [
+            cls(menu_item_id=item['menu_item_id'], name=item.get('name', ''), price=item.get('price', 0),
+                quantity=item.get('quantity', 1), total=item.get('total', 0))
+            for item in items if item.get('menu_item_id') is not None
+        ]
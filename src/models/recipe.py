@@ -0,0 +1,37 @@
+from src.models.user import db
+from datetime import datetime
+
+class RecipeIngredient(db.Model):
+    """How much of an inventory item one portion of a menu item uses."""
+    id = db.Column(db.Integer, primary_key=True)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id', ondelete='CASCADE'), nullable=False, index=True)
+    inventory_item_id = db.Column(db.Integer, db.ForeignKey('inventory_item.id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)  # in the inventory item's unit, per portion
+
+    __table_args__ = (
+        db.UniqueConstraint('menu_item_id', 'inventory_item_id', name='uq_recipe_ingredient'),
+    )
+
+    # Relationships
+    inventory_item = db.relationship('InventoryItem')
+
+    def __repr__(self):
+        return f'<RecipeIngredient {self.menu_item_id} uses {self.quantity} of {self.inventory_item_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'menu_item_id': self.menu_item_id,
+            'inventory_item_id': self.inventory_item_id,
+            'inventory_item_name': self.inventory_item.name if self.inventory_item else None,
+            'unit': self.inventory_item.unit if self.inventory_item else None,
+            'quantity': self.quantity
+        }
+
+class OrderStockDeduction(db.Model):
+    """Marks an order whose ingredients have been taken out of stock, so it happens only once."""
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), primary_key=True)
+    deducted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<OrderStockDeduction {self.order_id}>'
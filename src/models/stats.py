@@ -0,0 +1,70 @@
+from src.models.user import db
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def upsert_increment(model, keys, increments):
+    """Add ``increments`` to the counter row identified by ``keys``, creating it if needed.
+
+    Runs as a single INSERT ... ON CONFLICT DO UPDATE on SQLite and PostgreSQL,
+    so concurrent writers never lose an increment. Other backends fall back to
+    UPDATE followed by INSERT when no row matched.
+    """
+    table = model.__table__
+    dialect = db.session.get_bind(mapper=model.__mapper__).dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert
+        stmt = insert(table).values(**keys, **increments)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + stmt.excluded[name] for name in increments}
+        )
+        db.session.execute(stmt)
+        return
+
+    result = db.session.execute(
+        table.update()
+        .where(*[table.c[name] == value for name, value in keys.items()])
+        .values({name: table.c[name] + value for name, value in increments.items()})
+    )
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(**keys, **increments))
+
+
+class OrderStatusCounter(db.Model):
+    """Running order count and revenue per status, kept in step with every order write
+    when ORDER_STATS_COUNTERS is enabled so the dashboard never has to scan orders."""
+    status = db.Column(db.String(20), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OrderStatusCounter {self.status}: {self.order_count}>'
+
+    @classmethod
+    def bump(cls, status, count, revenue):
+        upsert_increment(cls, {'status': status}, {'order_count': count, 'revenue': revenue})
+
+
+class SalesRollup(db.Model):
+    """Order count and revenue per hour, order type and status, updated with every
+    order write so sales reports never scan the order table."""
+    hour = db.Column(db.DateTime, primary_key=True)  # start of the hour the orders were placed in
+    order_type = db.Column(db.String(20), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SalesRollup {self.hour} {self.order_type}/{self.status}: {self.order_count}>'
+
+    @staticmethod
+    def hour_of(moment):
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def bump(cls, placed_at, order_type, status, count, revenue):
+        upsert_increment(
+            cls,
+            {'hour': cls.hour_of(placed_at), 'order_type': order_type, 'status': status},
+            {'order_count': count, 'revenue': revenue}
+        )
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.passwords import hash_password, verify_password, needs_rehash
+from src.replica import RoutingSession
+from src.serialization import Projection, isoformat
 from datetime import datetime
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,10 +16,13 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -31,3 +36,13 @@ class User(db.Model):
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+# Column-level twin of User.to_dict() for list endpoints
+USER_FIELDS = Projection(
+    ('id', User.id),
+    ('username', User.username),
+    ('email', User.email),
+    ('role', User.role),
+    ('is_active', User.is_active),
+    ('created_at', User.created_at, isoformat),
+)
@@ -0,0 +1,139 @@
+import base64
+import json
+from datetime import datetime
+from flask import jsonify, request
+from sqlalchemy import DateTime, and_, or_
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed limit, cursor or fields query parameter."""
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def encode_cursor(values):
+    """Turn the sort-key values of the last row on a page into an opaque token."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise PaginationError('Invalid cursor')
+    return [_cursor_value(column, value) for column, value in zip(columns, payload)]
+
+
+def _cursor_value(column, value):
+    # Anything but a value of the column's own type would reach the SQL comparison
+    # (None, lists and objects even make SQLAlchemy raise), so reject it here
+    if isinstance(column.type, DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = (str, int, float)
+    if python_type is float:
+        python_type = (int, float)  # JSON writes 2.0 as 2.0, but hand-made cursors may say 2
+    if isinstance(value, bool) and python_type is not bool or not isinstance(value, python_type):
+        raise PaginationError('Invalid cursor')
+    return value
+
+
+def keyset_filter(ordering, values):
+    """Build the "comes after this row" predicate for a list of (column, descending) sort keys.
+
+    Equivalent to a row-value comparison such as ``(created_at, id) < (?, ?)``,
+    spelled out with AND/OR so it works on every backend and can use the index
+    on the sort columns.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(ordering):
+        equal_prefix = [ordering[j][0] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, beyond))
+    return or_(*clauses)
+
+
+def order_by_clauses(ordering):
+    return [column.desc() if descending else column.asc() for column, descending in ordering]
+
+
+def keyset_page(query, ordering, cursor=None, limit=DEFAULT_LIMIT):
+    """Fetch one page of ``query`` sorted by ``ordering``.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page,
+    and every remaining row is returned when ``limit`` is None. One extra row
+    is fetched to find out whether another page exists.
+    """
+    columns = [column for column, _ in ordering]
+    if cursor:
+        query = query.filter(keyset_filter(ordering, decode_cursor(cursor, columns)))
+    query = query.order_by(*order_by_clauses(ordering))
+    if limit is None:
+        return query.all(), None
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return rows, next_cursor
+
+
+def parse_fields(value, projection):
+    """Narrow ``projection`` to a comma-separated list of field names; ``id`` is always kept."""
+    if not value:
+        return projection
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = sorted(names - set(projection.keys()))
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return projection.only(names | {'id'})
+
+
+def paginated_response(query, projection, ordering, default_limit=DEFAULT_LIMIT, to_dicts=None):
+    """Answer a list request from ``query`` using the ``fields``, ``limit`` and ``cursor`` parameters.
+
+    Only the requested fields of ``projection`` (plus the sort columns) are
+    selected. ``ordering`` must end in a unique column so cursors are exact;
+    the next page's cursor goes in the ``X-Next-Cursor`` header. With
+    ``default_limit=None`` the whole list is returned unless ``limit`` is
+    given. ``to_dicts(rows, fields)`` replaces ``fields.to_dicts(rows)`` for
+    lists that need more than their columns. Malformed parameters get a 400.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), projection)
+        limit = parse_limit(request.args.get('limit'), default=default_limit)
+        # The cursor is read from the last row, so its sort columns are selected even when not asked for
+        selected = set(fields.keys())
+        query = fields.select(query).add_columns(
+            *[column.label(column.key) for column, _ in ordering if column.key not in selected]
+        )
+        rows, next_cursor = keyset_page(query, ordering, cursor=request.args.get('cursor'), limit=limit)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify(to_dicts(rows, fields) if to_dicts else fields.to_dicts(rows))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
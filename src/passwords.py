@@ -0,0 +1,180 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from src.cache import TTLCache
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; admission is then counted per process only
+    fcntl = None
+
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is already full; the caller should answer 503."""
+
+
+class HostSlots:
+    """A counting semaphore shared by every worker process on the host.
+
+    Each slot is a lock file under ``directory`` held with ``flock``. The kernel
+    drops the lock when its holder exits, so a crashed worker never leaks a slot.
+    """
+
+    def __init__(self, directory, name, count):
+        self.paths = [os.path.join(directory, f'{name}.{index}.slot') for index in range(count)]
+        os.makedirs(directory, exist_ok=True)
+
+    def try_acquire(self):
+        """Take a free slot without waiting; returns a token for ``release()``, or None if all are taken."""
+        start = random.randrange(len(self.paths))  # spread callers over the slots
+        for path in self.paths[start:] + self.paths[:start]:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def release(self, fd):
+        os.close(fd)  # closing the descriptor releases its lock
+
+
+class HashingPool:
+    """Runs password hashing on a few background threads with admission control.
+
+    At most ``workers + queue_size`` hashes are admitted at once per process, and
+    at most as many as ``host_slots`` has slots across all workers on the host;
+    anything beyond that is rejected immediately instead of piling up behind a
+    login burst. hashlib's PBKDF2 and scrypt release the GIL, so the hashing
+    threads do not stall the rest of the worker.
+    """
+
+    def __init__(self, workers=2, queue_size=8, timeout=10, host_slots=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._host_slots = host_slots
+        self.timeout = timeout
+
+    def _admit(self):
+        """Take a process slot and a host slot; returns a function releasing both."""
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        if self._host_slots is None:
+            return self._slots.release
+        token = self._host_slots.try_acquire()
+        if token is None:
+            self._slots.release()
+            raise HashingBusy()
+
+        def release():
+            self._host_slots.release(token)
+            self._slots.release()
+        return release
+
+    def run(self, fn, *args):
+        release = self._admit()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(lambda _: release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy()
+
+
+_pool = None
+
+
+def _hashing_pool():
+    global _pool
+    if _pool is None:
+        _pool = HashingPool(
+            workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+            queue_size=current_app.config.get('PASSWORD_HASH_QUEUE', 8),
+            timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 10),
+            host_slots=HostSlots(
+                current_app.config['SHARED_STATE_DIR'], 'password-hash',
+                current_app.config.get('PASSWORD_HASH_HOST_LIMIT', 8)
+            ) if fcntl is not None else None
+        )
+    return _pool
+
+
+def _hash_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+
+
+def hash_password(password):
+    return _hashing_pool().run(generate_password_hash, password, _hash_method())
+
+
+def verify_password(password_hash, password):
+    return _hashing_pool().run(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # e.g. 'pbkdf2' -> 'pbkdf2:sha256:600000', as written at the start of new hashes
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a different method or work factor than configured."""
+    return password_hash.split('$', 1)[0] != _method_prefix(_hash_method())
+
+
+class LoginThrottle:
+    """Counts failed logins per key (username or client address) in a fixed window.
+
+    Once a key reaches its limit, further attempts are refused without hashing
+    until the window runs out. State lives in memory, bounded in size.
+    """
+
+    def __init__(self, window=900, maxsize=10000):
+        self.window = window
+        self._failures = TTLCache(maxsize=maxsize, ttl=window)
+        self._lock = threading.Lock()
+
+    def _entry(self, key, now):
+        entry = self._failures.get(key)
+        if entry is None or entry[1] + self.window <= now:
+            return 0, now
+        return entry
+
+    def retry_after(self, key, limit):
+        """Seconds until ``key`` may try again, or 0 if it is not locked out."""
+        now = time.monotonic()
+        count, window_start = self._entry(key, now)
+        if count < limit:
+            return 0
+        return int(window_start + self.window - now) + 1
+
+    def record_failure(self, key):
+        with self._lock:
+            count, window_start = self._entry(key, time.monotonic())
+            self._failures.set(key, (count + 1, window_start))
+
+    def reset(self, key):
+        self._failures.pop(key)
+
+
+_throttle = None
+
+
+def login_throttle():
+    global _throttle
+    if _throttle is None:
+        _throttle = LoginThrottle(window=current_app.config.get('LOGIN_THROTTLE_WINDOW', 900))
+    return _throttle
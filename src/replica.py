@@ -0,0 +1,66 @@
+"""Optional read replica for GET requests.
+
+When READ_REPLICA_URL is set it becomes the ``replica`` bind. Blueprints
+passed to ``init_read_replica`` read from it on GET requests; everything else,
+and every request from a client that wrote something in the last
+READ_REPLICA_STICKY_SECONDS, stays on the primary so clients see their own
+changes despite replication lag.
+"""
+import time
+from contextlib import contextmanager
+from flask import current_app, request, session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+_READ_REPLICA = 'read_replica'
+
+
+class RoutingSession(Session):
+    """Session that sends queries for the primary database to the replica while reads are routed there."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and self.info.get(_READ_REPLICA) and not self._flushing:
+            engines = self._db.engines
+            if engine is engines[None] and REPLICA_BIND in engines:
+                return engines[REPLICA_BIND]
+        return engine
+
+
+def _db_session():
+    return current_app.extensions['sqlalchemy'].session
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside this block, even during a replica-routed request."""
+    db_session = _db_session()
+    previous = db_session.info.pop(_READ_REPLICA, False)
+    try:
+        yield
+    finally:
+        if previous:
+            db_session.info[_READ_REPLICA] = previous
+
+
+def _stick_to_primary_after_write(response):
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 \
+            and REPLICA_BIND in current_app.config['SQLALCHEMY_BINDS']:
+        session['primary_until'] = time.time() + current_app.config.get('READ_REPLICA_STICKY_SECONDS', 5)
+    return response
+
+
+def init_read_replica(app, *blueprints):
+    """Route GET requests of ``blueprints`` to the replica, if one is configured."""
+    names = {blueprint.name for blueprint in blueprints}
+
+    @app.before_request
+    def route_get_to_replica():
+        if request.blueprint not in names or request.method not in ('GET', 'HEAD') \
+                or REPLICA_BIND not in current_app.config['SQLALCHEMY_BINDS']:
+            return
+        if session.get('primary_until', 0) > time.time():
+            return
+        _db_session().info[_READ_REPLICA] = True
+
+    app.after_request(_stick_to_primary_after_write)
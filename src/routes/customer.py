@@ -0,0 +1,47 @@
+from flask import Blueprint, current_app
+from src.cache import CompressedSnapshot
+from src.models.menu import MenuItem, MENU_ITEM_FIELDS
+from src.models.event import Event
+from src.routes.menu import menu_responses
+from src.routes.event import event_responses
+from datetime import datetime
+
+customer_bp = Blueprint('customer', __name__)
+
+_bootstrap = None
+
+
+def build_bootstrap():
+    """Everything the customer page shows on load: the available menu by category and upcoming events"""
+    rows = MENU_ITEM_FIELDS.select(
+        MenuItem.query.filter_by(is_available=True).order_by(MenuItem.category, MenuItem.name)
+    )
+    menu = {}
+    for item in MENU_ITEM_FIELDS.to_dicts(rows):
+        menu.setdefault(item['category'], []).append(item)
+    events = Event.query.filter_by(is_active=True).filter(Event.event_date >= datetime.utcnow()) \
+        .order_by(Event.event_date).all()
+    return {
+        'categories': list(menu),
+        'menu': menu,
+        'events': [event.to_dict() for event in events]
+    }
+
+
+def _bootstrap_snapshot():
+    global _bootstrap
+    if _bootstrap is None:
+        # Rebuilt when a menu item or event changes (in any worker), and after
+        # RESPONSE_CACHE_TTL seconds so events that have started drop off
+        _bootstrap = CompressedSnapshot(
+            build_bootstrap,
+            (menu_responses.version, event_responses.version),
+            ttl=current_app.config.get('RESPONSE_CACHE_TTL', 300)
+        )
+    return _bootstrap
+
+
+@customer_bp.route('/customer/bootstrap', methods=['GET'])
+def get_customer_bootstrap():
+    """Public endpoint with the customer page's initial data, served precompressed"""
+    return _bootstrap_snapshot().response()
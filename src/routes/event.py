@@ -1,31 +1,20 @@
 from flask import Blueprint, jsonify, request, session
-from src.models.user import User, db
-from src.models.event import Event
+from src.models.user import db
+from src.auth import admin_required
+from src.cache import ResponseCache
+from src.models.event import Event, EVENT_FIELDS
+from src.pagination import paginated_response
 from datetime import datetime
-from functools import wraps
 
 event_bp = Blueprint('event', __name__)
 
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        return f(*args, **kwargs)
-    return decorated_function
+# Public event responses; every change to an event drops them in all workers
+event_responses = ResponseCache('events')
 
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        user = User.query.get(session['user_id'])
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-        return f(*args, **kwargs)
-    return decorated_function
+EVENT_LIST_ORDERING = [(Event.event_date, False), (Event.id, False)]
 
 @event_bp.route('/events', methods=['GET'])
+@event_responses.cached
 def get_events():
     """Public endpoint to get all active events"""
     active_only = request.args.get('active', 'true').lower() == 'true'
@@ -39,8 +28,7 @@ def get_events():
     if upcoming_only:
         query = query.filter(Event.event_date >= datetime.utcnow())
     
-    events = query.order_by(Event.event_date).all()
-    return jsonify([event.to_dict() for event in events])
+    return paginated_response(query, EVENT_FIELDS, EVENT_LIST_ORDERING, default_limit=None)
 
 @event_bp.route('/events', methods=['POST'])
 @admin_required
@@ -66,9 +54,11 @@ def create_event():
     
     db.session.add(event)
     db.session.commit()
+    event_responses.invalidate()
     return jsonify(event.to_dict()), 201
 
 @event_bp.route('/events/<int:event_id>', methods=['GET'])
+@event_responses.cached
 def get_event(event_id):
     """Public endpoint to get a specific event"""
     event = Event.query.get_or_404(event_id)
@@ -94,6 +84,7 @@ def update_event(event_id):
             return jsonify({'error': 'Invalid event_date format. Use ISO format.'}), 400
     
     db.session.commit()
+    event_responses.invalidate()
     return jsonify(event.to_dict())
 
 @event_bp.route('/events/<int:event_id>', methods=['DELETE'])
@@ -102,6 +93,7 @@ def delete_event(event_id):
     event = Event.query.get_or_404(event_id)
     db.session.delete(event)
     db.session.commit()
+    event_responses.invalidate()
     return '', 204
 
 @event_bp.route('/events/<int:event_id>/toggle-active', methods=['PATCH'])
@@ -110,5 +102,6 @@ def toggle_event_active(event_id):
     event = Event.query.get_or_404(event_id)
     event.is_active = not event.is_active
     db.session.commit()
+    event_responses.invalidate()
     return jsonify(event.to_dict())
 
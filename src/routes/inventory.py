@@ -1,29 +1,26 @@
 from flask import Blueprint, jsonify, request, session
-from src.models.user import User, db
-from src.models.inventory import InventoryItem, StockMovement
-from datetime import datetime
-from functools import wraps
+from src.models.user import db
+from src.auth import login_required, admin_required
+from src.models.inventory import (InventoryItem, StockMovement, StockSnapshot, INVENTORY_ITEM_FIELDS,
+                                  STOCK_MOVEMENT_FIELDS)
+from src.models.recipe import RecipeIngredient
+from src.change_hub import hub
+from src.pagination import paginated_response
+from sqlalchemy import func
+from datetime import datetime, timedelta
+import math
+import numpy as np
 
 inventory_bp = Blueprint('inventory', __name__)
 
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        return f(*args, **kwargs)
-    return decorated_function
-
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        user = User.query.get(session['user_id'])
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-        return f(*args, **kwargs)
-    return decorated_function
+MAX_FORECAST_WINDOW = 365  # days; the forecast builds an items x window matrix
+INVENTORY_LIST_ORDERING = [(InventoryItem.category, False), (InventoryItem.name, False), (InventoryItem.id, False)]
+
+def publish_low_stock_change(item, was_low):
+    """Tell dashboard listeners when an item crosses its minimum stock level."""
+    is_low = item.is_low_stock()
+    if is_low != was_low:
+        hub.publish('low_stock', {'id': item.id, 'name': item.name, 'is_low': is_low})
 
 @inventory_bp.route('/inventory', methods=['GET'])
 @login_required
@@ -36,12 +33,10 @@ def get_inventory():
     if category:
         query = query.filter_by(category=category)
     
-    items = query.order_by(InventoryItem.category, InventoryItem.name).all()
-    
     if low_stock_only:
-        items = [item for item in items if item.is_low_stock()]
+        query = query.filter(InventoryItem.is_low_stock())
     
-    return jsonify([item.to_dict() for item in items])
+    return paginated_response(query, INVENTORY_ITEM_FIELDS, INVENTORY_LIST_ORDERING, default_limit=None)
 
 @inventory_bp.route('/inventory/categories', methods=['GET'])
 @login_required
@@ -54,9 +49,9 @@ def get_inventory_categories():
 @login_required
 def get_low_stock_items():
     """Get all items with low stock"""
-    items = InventoryItem.query.all()
-    low_stock_items = [item for item in items if item.is_low_stock()]
-    return jsonify([item.to_dict() for item in low_stock_items])
+    query = InventoryItem.query.filter(InventoryItem.is_low_stock()) \
+        .order_by(InventoryItem.category, InventoryItem.name)
+    return jsonify(INVENTORY_ITEM_FIELDS.to_dicts(INVENTORY_ITEM_FIELDS.select(query)))
 
 @inventory_bp.route('/inventory', methods=['POST'])
 @admin_required
@@ -72,11 +67,16 @@ def create_inventory_item():
         minimum_stock=data.get('minimum_stock', 0),
         unit_cost=data.get('unit_cost', 0),
         supplier_name=data.get('supplier_name', ''),
-        supplier_contact=data.get('supplier_contact', '')
+        supplier_contact=data.get('supplier_contact', ''),
+        created_at=datetime.utcnow()
     )
     
     db.session.add(item)
+    db.session.flush()
+    # Opening stock is not a movement, so record it as the item's first snapshot
+    db.session.add(StockSnapshot(inventory_item_id=item.id, taken_at=item.created_at, stock=item.current_stock))
     db.session.commit()
+    publish_low_stock_change(item, False)
     return jsonify(item.to_dict()), 201
 
 @inventory_bp.route('/inventory/<int:item_id>', methods=['GET'])
@@ -90,6 +90,7 @@ def get_inventory_item(item_id):
 def update_inventory_item(item_id):
     item = InventoryItem.query.get_or_404(item_id)
     data = request.json
+    was_low = item.is_low_stock()
     
     item.name = data.get('name', item.name)
     item.description = data.get('description', item.description)
@@ -101,24 +102,49 @@ def update_inventory_item(item_id):
     item.supplier_contact = data.get('supplier_contact', item.supplier_contact)
     
     db.session.commit()
+    publish_low_stock_change(item, was_low)
     return jsonify(item.to_dict())
 
 @inventory_bp.route('/inventory/<int:item_id>', methods=['DELETE'])
 @admin_required
 def delete_inventory_item(item_id):
     item = InventoryItem.query.get_or_404(item_id)
+    was_low = item.is_low_stock()
+    deleted = {'id': item.id, 'name': item.name, 'is_low': False}
+    RecipeIngredient.query.filter_by(inventory_item_id=item_id).delete(synchronize_session=False)
+    StockSnapshot.query.filter_by(inventory_item_id=item_id).delete(synchronize_session=False)
     db.session.delete(item)
     db.session.commit()
+    if was_low:
+        hub.publish('low_stock', deleted)
     return '', 204
 
+def _parse_movement(data):
+    """Validate one movement payload; returns (movement_type, quantity) or raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError('movement must be an object')
+    movement_type = data.get('movement_type')  # 'in', 'out', 'adjustment'
+    if movement_type not in StockMovement.TYPES:
+        raise ValueError(f'Invalid movement_type. Must be one of: {list(StockMovement.TYPES)}')
+    try:
+        quantity = float(data['quantity'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('quantity must be a number')
+    if quantity < 0:
+        raise ValueError('quantity cannot be negative')
+    return movement_type, quantity
+
 @inventory_bp.route('/inventory/<int:item_id>/stock-movement', methods=['POST'])
 @login_required
 def create_stock_movement(item_id):
     item = InventoryItem.query.get_or_404(item_id)
     data = request.json
+    was_low = item.is_low_stock()
     
-    movement_type = data['movement_type']  # 'in', 'out', 'adjustment'
-    quantity = float(data['quantity'])
+    try:
+        movement_type, quantity = _parse_movement(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Create stock movement record
     movement = StockMovement(
@@ -129,32 +155,130 @@ def create_stock_movement(item_id):
         performed_by=session['user_id']
     )
     
-    # Update current stock
-    if movement_type == 'in':
-        item.current_stock += quantity
-        item.last_restocked = datetime.utcnow()
-    elif movement_type == 'out':
-        item.current_stock -= quantity
-    elif movement_type == 'adjustment':
-        item.current_stock = quantity
-    
-    # Ensure stock doesn't go negative
-    if item.current_stock < 0:
-        item.current_stock = 0
+    # Update current stock atomically in the database
+    InventoryItem.apply_stock_movement(item_id, movement_type, quantity)
     
     db.session.add(movement)
     db.session.commit()
+    publish_low_stock_change(item, was_low)
     
     return jsonify({
         'movement': movement.to_dict(),
         'updated_item': item.to_dict()
     }), 201
 
+@inventory_bp.route('/inventory/stock-movements/bulk', methods=['POST'])
+@login_required
+def create_stock_movements_bulk():
+    """Apply many stock movements (e.g. a whole delivery) in one transaction.
+
+    Body: ``{"movements": [{"inventory_item_id", "movement_type", "quantity", "reason"}, ...]}``.
+    Movements are applied in the order given; if any entry is invalid nothing is written.
+    """
+    data = request.json or {}
+    entries = data.get('movements') if isinstance(data, dict) else data
+    if not entries or not isinstance(entries, list):
+        return jsonify({'error': 'movements must be a non-empty list'}), 400
+    
+    parsed = []
+    for index, entry in enumerate(entries):
+        try:
+            movement_type, quantity = _parse_movement(entry)
+            item_id = int(entry['inventory_item_id'])
+        except (KeyError, TypeError, ValueError) as e:
+            message = str(e) if not isinstance(e, KeyError) else 'inventory_item_id is required'
+            return jsonify({'error': f'Movement {index}: {message}'}), 400
+        parsed.append((item_id, movement_type, quantity, entry.get('reason', '')))
+    
+    item_ids = {item_id for item_id, _, _, _ in parsed}
+    items = {item.id: item for item in InventoryItem.query.filter(InventoryItem.id.in_(item_ids))}
+    missing = sorted(item_ids - items.keys())
+    if missing:
+        return jsonify({'error': f'Inventory items not found: {missing}'}), 404
+    was_low = {item_id: item.is_low_stock() for item_id, item in items.items()}
+    
+    now = datetime.utcnow()
+    movements = []
+    for item_id, movement_type, quantity, reason in parsed:
+        InventoryItem.apply_stock_movement(item_id, movement_type, quantity, now)
+        movements.append(StockMovement(
+            inventory_item_id=item_id,
+            movement_type=movement_type,
+            quantity=quantity,
+            reason=reason,
+            performed_by=session['user_id'],
+            created_at=now
+        ))
+    
+    db.session.add_all(movements)
+    db.session.flush()
+    movement_data = [movement.to_dict() for movement in movements]
+    db.session.commit()
+    # Reload the updated items with one query rather than one per item
+    InventoryItem.query.filter(InventoryItem.id.in_(item_ids)).all()
+    
+    for item_id, item in items.items():
+        publish_low_stock_change(item, was_low[item_id])
+    
+    return jsonify({
+        'movements': movement_data,
+        'updated_items': [item.to_dict() for item in items.values()]
+    }), 201
+
+MOVEMENT_ORDERING = [(StockMovement.created_at, True), (StockMovement.id, True)]
+
 @inventory_bp.route('/inventory/<int:item_id>/movements', methods=['GET'])
 @login_required
 def get_stock_movements(item_id):
-    movements = StockMovement.query.filter_by(inventory_item_id=item_id).order_by(StockMovement.created_at.desc()).all()
-    return jsonify([movement.to_dict() for movement in movements])
+    """An item's stock movements, newest first, ``limit`` at a time.
+
+    The ``cursor`` for the next page is returned in the ``X-Next-Cursor`` header;
+    ``fields`` picks the columns returned.
+    """
+    return paginated_response(StockMovement.query.filter_by(inventory_item_id=item_id),
+                              STOCK_MOVEMENT_FIELDS, MOVEMENT_ORDERING)
+
+@inventory_bp.route('/inventory/<int:item_id>/stock-at', methods=['GET'])
+@login_required
+def get_stock_at(item_id):
+    """Stock level of an item at a past moment (``at``, ISO datetime).
+
+    Starts from the latest snapshot taken at or before ``at`` and replays only
+    the movements logged between the two.
+    """
+    item = InventoryItem.query.get_or_404(item_id)
+    try:
+        at = datetime.fromisoformat(request.args['at'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'at is required in ISO format'}), 400
+    
+    snapshot = StockSnapshot.query.filter(
+        StockSnapshot.inventory_item_id == item_id,
+        StockSnapshot.taken_at <= at
+    ).order_by(StockSnapshot.taken_at.desc()).first()
+    if snapshot is None:
+        return jsonify({'error': f'No stock snapshot of {item.name} exists before {at.isoformat()}'}), 404
+    
+    movements = db.session.query(StockMovement.movement_type, StockMovement.quantity).filter(
+        StockMovement.inventory_item_id == item_id,
+        StockMovement.created_at > snapshot.taken_at,
+        StockMovement.created_at <= at
+    ).order_by(StockMovement.created_at, StockMovement.id).all()
+    
+    return jsonify({
+        'inventory_item_id': item_id,
+        'at': at.isoformat(),
+        'stock': StockMovement.replay(snapshot.stock, movements),
+        'snapshot_taken_at': snapshot.taken_at.isoformat(),
+        'movements_replayed': len(movements)
+    })
+
+@inventory_bp.cli.command('snapshot')
+def snapshot_stock():
+    """Checkpoint the current stock of every item (run daily, e.g. from cron)."""
+    taken_at = StockSnapshot.take_all()
+    db.session.commit()
+    print(f'Stock snapshot taken at {taken_at.isoformat()}')
 
 @inventory_bp.route('/inventory/reports/usage', methods=['GET'])
 @admin_required
@@ -163,3 +287,132 @@ def get_usage_report():
     movements = StockMovement.query.filter_by(movement_type='out').order_by(StockMovement.created_at.desc()).limit(100).all()
     return jsonify([movement.to_dict() for movement in movements])
 
+CONSUMPTION_BUCKETS = ('day', 'week', 'month')
+
+def _date_bucket(column, bucket):
+    """SQL expression truncating a timestamp to the start of its day, week (Monday) or month."""
+    if db.session.get_bind(mapper=StockMovement.__mapper__).dialect.name == 'sqlite':
+        if bucket == 'day':
+            return func.date(column)
+        if bucket == 'week':
+            return func.date(column, 'weekday 0', '-6 days')
+        return func.date(column, 'start of month')
+    return func.date(func.date_trunc(bucket, column))
+
+def _parse_range(default_days):
+    date_to = datetime.fromisoformat(request.args['to']) if request.args.get('to') else datetime.utcnow()
+    date_from = datetime.fromisoformat(request.args['from']) if request.args.get('from') \
+        else date_to - timedelta(days=default_days)
+    return date_from, date_to
+
+@inventory_bp.route('/inventory/reports/consumption', methods=['GET'])
+@admin_required
+def get_consumption_report():
+    """Quantity used per item per day, week or month, aggregated in the database.
+
+    Query parameters: ``from``/``to`` (ISO datetimes, default the last 30 days),
+    ``bucket`` (day, week or month) and optionally ``item_id``.
+    """
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in CONSUMPTION_BUCKETS:
+        return jsonify({'error': f'Invalid bucket. Must be one of: {list(CONSUMPTION_BUCKETS)}'}), 400
+    try:
+        date_from, date_to = _parse_range(30)
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to format. Use ISO format.'}), 400
+    
+    period = _date_bucket(StockMovement.created_at, bucket).label('period')
+    query = db.session.query(
+        StockMovement.inventory_item_id,
+        InventoryItem.name,
+        InventoryItem.unit,
+        period,
+        func.sum(StockMovement.quantity).label('quantity'),
+        func.count(StockMovement.id).label('movement_count')
+    ).join(InventoryItem, InventoryItem.id == StockMovement.inventory_item_id).filter(
+        StockMovement.movement_type == 'out',
+        StockMovement.created_at >= date_from,
+        StockMovement.created_at <= date_to
+    )
+    if request.args.get('item_id'):
+        query = query.filter(StockMovement.inventory_item_id == request.args.get('item_id', type=int))
+    
+    rows = query.group_by(StockMovement.inventory_item_id, InventoryItem.name, InventoryItem.unit, period) \
+        .order_by(period, StockMovement.inventory_item_id).all()
+    return jsonify([{
+        'inventory_item_id': row.inventory_item_id,
+        'name': row.name,
+        'unit': row.unit,
+        'period_start': str(row.period),
+        'quantity': row.quantity,
+        'movement_count': row.movement_count
+    } for row in rows])
+
+@inventory_bp.route('/inventory/reports/reorder-forecast', methods=['GET'])
+@admin_required
+def get_reorder_forecast():
+    """Average daily usage and days until stock-out for every inventory item.
+
+    Daily 'out' totals for the last ``window`` days (default 28, at most
+    MAX_FORECAST_WINDOW) come from one GROUP BY; the moving averages and
+    stock-out estimates for all items are then computed together as arrays.
+    ``lead_time`` (default 7 days) flags items that will run out before a new
+    delivery could arrive.
+    """
+    window = request.args.get('window', 28, type=int)
+    if not 1 <= window <= MAX_FORECAST_WINDOW:
+        return jsonify({'error': f'window must be between 1 and {MAX_FORECAST_WINDOW} days'}), 400
+    lead_time = request.args.get('lead_time', 7, type=float)
+    if not math.isfinite(lead_time) or lead_time < 0:
+        return jsonify({'error': 'lead_time must be a finite number of days, at least 0'}), 400
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=window - 1)
+    
+    items = db.session.query(
+        InventoryItem.id, InventoryItem.name, InventoryItem.unit,
+        InventoryItem.current_stock, InventoryItem.minimum_stock
+    ).order_by(InventoryItem.id).all()
+    if not items:
+        return jsonify([])
+    
+    day = _date_bucket(StockMovement.created_at, 'day')
+    usage = db.session.query(StockMovement.inventory_item_id, day, func.sum(StockMovement.quantity)).filter(
+        StockMovement.movement_type == 'out',
+        StockMovement.created_at >= datetime.combine(start, datetime.min.time())
+    ).group_by(StockMovement.inventory_item_id, day).all()
+    
+    item_ids = np.array([item.id for item in items])
+    current_stock = np.array([item.current_stock for item in items], dtype=float)
+    minimum_stock = np.array([item.minimum_stock for item in items], dtype=float)
+    
+    # items x days matrix of quantities used
+    daily = np.zeros((len(items), window))
+    if usage:
+        usage_ids, usage_days, usage_quantities = zip(*usage)
+        usage_ids = np.array(usage_ids)
+        rows = np.minimum(np.searchsorted(item_ids, usage_ids), len(item_ids) - 1)
+        cols = (np.array(usage_days, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(int)
+        valid = (item_ids[rows] == usage_ids) & (cols >= 0) & (cols < window)
+        np.add.at(daily, (rows[valid], cols[valid]), np.array(usage_quantities, dtype=float)[valid])
+    
+    average_usage = daily.mean(axis=1)
+    recent_usage = daily[:, -min(7, window):].mean(axis=1)
+    # Plan on whichever rate is higher so a recent spike is not averaged away
+    planning_usage = np.maximum(average_usage, recent_usage)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(planning_usage > 0, current_stock / planning_usage, np.inf)
+    reorder = (days_left <= lead_time) | (current_stock <= minimum_stock)
+    suggested = np.maximum(minimum_stock + planning_usage * lead_time - current_stock, 0)
+    
+    return jsonify([{
+        'inventory_item_id': item.id,
+        'name': item.name,
+        'unit': item.unit,
+        'current_stock': item.current_stock,
+        'minimum_stock': item.minimum_stock,
+        'average_daily_usage': round(float(average_usage[i]), 3),
+        'recent_daily_usage': round(float(recent_usage[i]), 3),
+        'days_until_stockout': round(float(days_left[i]), 1) if np.isfinite(days_left[i]) else None,
+        'reorder_now': bool(reorder[i]),
+        'suggested_reorder_quantity': round(float(suggested[i]), 3)
+    } for i, item in enumerate(items)])
@@ -1,30 +1,21 @@
 from flask import Blueprint, jsonify, request, session
-from src.models.user import User, db
-from src.models.menu import MenuItem
-from functools import wraps
+from src.models.user import db
+from src.auth import login_required, chef_or_admin_required
+from src.cache import ResponseCache
+from src.models.menu import MenuItem, MENU_ITEM_FIELDS
+from src.models.inventory import InventoryItem
+from src.models.recipe import RecipeIngredient
+from src.pagination import paginated_response
 
 menu_bp = Blueprint('menu', __name__)
 
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        return f(*args, **kwargs)
-    return decorated_function
+# Public menu responses; every change to a menu item drops them in all workers
+menu_responses = ResponseCache('menu')
 
-def chef_or_admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        user = User.query.get(session['user_id'])
-        if not user or user.role not in ['admin', 'chef']:
-            return jsonify({'error': 'Chef or admin access required'}), 403
-        return f(*args, **kwargs)
-    return decorated_function
+MENU_LIST_ORDERING = [(MenuItem.category, False), (MenuItem.name, False), (MenuItem.id, False)]
 
 @menu_bp.route('/menu', methods=['GET'])
+@menu_responses.cached
 def get_menu():
     """Public endpoint to get all available menu items"""
     category = request.args.get('category')
@@ -38,10 +29,10 @@ def get_menu():
     if category:
         query = query.filter_by(category=category)
     
-    menu_items = query.order_by(MenuItem.category, MenuItem.name).all()
-    return jsonify([item.to_dict() for item in menu_items])
+    return paginated_response(query, MENU_ITEM_FIELDS, MENU_LIST_ORDERING, default_limit=None)
 
 @menu_bp.route('/menu/categories', methods=['GET'])
+@menu_responses.cached
 def get_categories():
     """Get all unique categories"""
     categories = db.session.query(MenuItem.category).distinct().all()
@@ -64,6 +55,7 @@ def create_menu_item():
     
     db.session.add(menu_item)
     db.session.commit()
+    menu_responses.invalidate()
     return jsonify(menu_item.to_dict()), 201
 
 @menu_bp.route('/menu/<int:item_id>', methods=['GET'])
@@ -86,14 +78,17 @@ def update_menu_item(item_id):
     menu_item.is_available = data.get('is_available', menu_item.is_available)
     
     db.session.commit()
+    menu_responses.invalidate()
     return jsonify(menu_item.to_dict())
 
 @menu_bp.route('/menu/<int:item_id>', methods=['DELETE'])
 @chef_or_admin_required
 def delete_menu_item(item_id):
     menu_item = MenuItem.query.get_or_404(item_id)
+    RecipeIngredient.query.filter_by(menu_item_id=item_id).delete(synchronize_session=False)
     db.session.delete(menu_item)
     db.session.commit()
+    menu_responses.invalidate()
     return '', 204
 
 @menu_bp.route('/menu/<int:item_id>/toggle-availability', methods=['PATCH'])
@@ -102,5 +97,46 @@ def toggle_menu_item_availability(item_id):
     menu_item = MenuItem.query.get_or_404(item_id)
     menu_item.is_available = not menu_item.is_available
     db.session.commit()
+    menu_responses.invalidate()
     return jsonify(menu_item.to_dict())
 
+@menu_bp.route('/menu/<int:item_id>/recipe', methods=['GET'])
+@login_required
+def get_recipe(item_id):
+    """Ingredients used by one portion of a menu item"""
+    MenuItem.query.get_or_404(item_id)
+    ingredients = RecipeIngredient.query.filter_by(menu_item_id=item_id) \
+        .options(db.joinedload(RecipeIngredient.inventory_item)).all()
+    return jsonify([ingredient.to_dict() for ingredient in ingredients])
+
+@menu_bp.route('/menu/<int:item_id>/recipe', methods=['PUT'])
+@chef_or_admin_required
+def update_recipe(item_id):
+    """Replace a menu item's recipe with ``{"ingredients": [{"inventory_item_id", "quantity"}, ...]}``"""
+    MenuItem.query.get_or_404(item_id)
+    data = request.json
+    
+    quantities = {}
+    for entry in data.get('ingredients', []):
+        try:
+            inventory_item_id = int(entry['inventory_item_id'])
+            quantity = float(entry['quantity'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each ingredient needs a numeric inventory_item_id and quantity'}), 400
+        if quantity <= 0:
+            return jsonify({'error': 'Ingredient quantity must be positive'}), 400
+        quantities[inventory_item_id] = quantities.get(inventory_item_id, 0) + quantity
+    
+    found = {row.id for row in db.session.query(InventoryItem.id).filter(InventoryItem.id.in_(list(quantities)))}
+    missing = sorted(set(quantities) - found)
+    if missing:
+        return jsonify({'error': f'Inventory items not found: {missing}'}), 400
+    
+    RecipeIngredient.query.filter_by(menu_item_id=item_id).delete(synchronize_session=False)
+    ingredients = [
+        RecipeIngredient(menu_item_id=item_id, inventory_item_id=inventory_item_id, quantity=quantity)
+        for inventory_item_id, quantity in quantities.items()
+    ]
+    db.session.add_all(ingredients)
+    db.session.commit()
+    return get_recipe(item_id)
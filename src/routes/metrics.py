@@ -0,0 +1,19 @@
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from src.metrics import metrics, metrics_directory
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/_metrics', methods=['GET'])
+def get_metrics():
+    """Request and SQL metrics of every worker on this host in the Prometheus text format.
+
+    Scrapers must send METRICS_TOKEN as a bearer token; without a token
+    configured the endpoint is switched off rather than left public.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        return jsonify({'error': 'Metrics are disabled; set METRICS_TOKEN to enable them'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Authentication required'}), 401
+    return Response(metrics.render(metrics_directory()), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,65 @@
+from flask import Blueprint, jsonify, request
+from src.models.user import db
+from src.auth import admin_required
+from src.models.stats import SalesRollup
+from datetime import datetime, timedelta
+
+report_bp = Blueprint('report', __name__)
+
+GRANULARITIES = ('hour', 'day', 'week')
+
+def _period_start(hour, granularity):
+    if granularity == 'hour':
+        return hour
+    day = hour.replace(hour=0)
+    if granularity == 'day':
+        return day
+    return day - timedelta(days=day.weekday())  # weeks start on Monday
+
+@report_bp.route('/reports/sales', methods=['GET'])
+@admin_required
+def get_sales_report():
+    """Order count and revenue over time, answered from the hourly sales rollup.
+
+    Query parameters: ``granularity`` (hour, day or week), ``from``/``to``
+    (ISO datetimes, default the last 30 days), ``order_type`` and ``status``
+    (comma-separated; cancelled orders are excluded unless asked for).
+    Periods without orders are omitted.
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f'Invalid granularity. Must be one of: {list(GRANULARITIES)}'}), 400
+    
+    try:
+        date_to = datetime.fromisoformat(request.args['to']) if request.args.get('to') else datetime.utcnow()
+        date_from = datetime.fromisoformat(request.args['from']) if request.args.get('from') \
+            else date_to - timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to format. Use ISO format.'}), 400
+    
+    query = db.session.query(SalesRollup.hour, SalesRollup.order_count, SalesRollup.revenue).filter(
+        SalesRollup.hour >= SalesRollup.hour_of(date_from),
+        SalesRollup.hour <= date_to
+    )
+    
+    order_type = request.args.get('order_type')
+    if order_type:
+        query = query.filter(SalesRollup.order_type.in_(order_type.split(',')))
+    
+    status = request.args.get('status')
+    if status:
+        query = query.filter(SalesRollup.status.in_(status.split(',')))
+    else:
+        query = query.filter(SalesRollup.status != 'cancelled')
+    
+    periods = {}
+    for hour, order_count, revenue in query:
+        start = _period_start(hour, granularity)
+        count_so_far, revenue_so_far = periods.get(start, (0, 0))
+        periods[start] = (count_so_far + order_count, revenue_so_far + revenue)
+    
+    return jsonify([{
+        'period_start': start.isoformat(),
+        'order_count': count,
+        'revenue': round(revenue, 2)
+    } for start, (count, revenue) in sorted(periods.items()) if count])
@@ -0,0 +1,52 @@
+import time
+from flask import Blueprint, Response, current_app
+from src.auth import login_required
+from src.change_hub import hub
+
+stream_bp = Blueprint('stream', __name__)
+
+KEEPALIVE_SECONDS = 15
+SYNC_SECONDS = 2  # how often to look for changes made in other workers
+
+def _dashboard_events(app):
+    # A fresh app context (rather than the request's) lets the loop read the shared
+    # change marker without keeping the request's database session open
+    with app.app_context():
+        yield from _dashboard_frames()
+
+def _dashboard_frames():
+    subscription = hub.subscribe()
+    try:
+        # Ask the browser to reconnect quickly if the connection drops
+        yield 'retry: 3000\n\n'
+        last_sent = time.monotonic()
+        while True:
+            hub.sync()
+            if subscription.overflowed:
+                # The client fell behind or another worker handled a change; it
+                # reloads the dashboard and reconnects
+                yield 'event: resync\ndata: {}\n\n'
+                return
+            frame = subscription.get(timeout=SYNC_SECONDS)
+            if frame is not None:
+                yield frame
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                # A comment line keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+    finally:
+        hub.unsubscribe(subscription)
+
+@stream_bp.route('/stream/dashboard', methods=['GET'])
+@login_required
+def stream_dashboard():
+    """Server-Sent Events feed of dashboard changes.
+
+    Events: order_created, order_status, order_deleted and low_stock. Clients
+    load the dashboard once, then apply these deltas instead of polling.
+    """
+    response = Response(_dashboard_events(current_app._get_current_object()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
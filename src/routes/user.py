@@ -1,27 +1,17 @@
-from flask import Blueprint, jsonify, request, session
-from src.models.user import User, db
-from functools import wraps
+from flask import Blueprint, current_app, jsonify, request, session
+from src.models.user import User, USER_FIELDS, db
+from src.auth import login_required, admin_required, invalidate_user
+from src.passwords import HashingBusy, login_throttle
+from src.pagination import paginated_response
 
 user_bp = Blueprint('user', __name__)
 
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        return f(*args, **kwargs)
-    return decorated_function
-
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        user = User.query.get(session['user_id'])
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-        return f(*args, **kwargs)
-    return decorated_function
+@user_bp.errorhandler(HashingBusy)
+def hashing_busy(error):
+    # Every hashing slot is taken; shed the request rather than queue it behind the burst
+    response = jsonify({'error': 'Server busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 @user_bp.route('/auth/register', methods=['POST'])
 def register():
@@ -54,9 +44,31 @@ def register():
 @user_bp.route('/auth/login', methods=['POST'])
 def login():
     data = request.json
+    throttle = login_throttle()
+    user_key = f"user:{data['username']}"
+    client_key = f'ip:{request.remote_addr}'
+
+    # Refuse locked-out usernames and addresses before spending any time on hashing
+    retry_after = max(
+        throttle.retry_after(user_key, current_app.config.get('LOGIN_MAX_FAILURES', 5)),
+        throttle.retry_after(client_key, current_app.config.get('LOGIN_MAX_FAILURES_PER_IP', 20))
+    )
+    if retry_after:
+        response = jsonify({'error': 'Too many failed login attempts, please try again later'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
     user = User.query.filter_by(username=data['username']).first()
     
     if user and user.check_password(data['password']) and user.is_active:
+        throttle.reset(user_key)
+        if user.password_needs_rehash():
+            # The configured hash method or work factor changed; upgrade while we have the password
+            try:
+                user.set_password(data['password'])
+                db.session.commit()
+            except HashingBusy:
+                pass
         session['user_id'] = user.id
         session['user_role'] = user.role
         return jsonify({
@@ -64,6 +76,8 @@ def login():
             'user': user.to_dict()
         })
     
+    throttle.record_failure(user_key)
+    throttle.record_failure(client_key)
     return jsonify({'error': 'Invalid credentials'}), 401
 
 @user_bp.route('/auth/logout', methods=['POST'])
@@ -81,8 +95,7 @@ def get_current_user():
 @user_bp.route('/users', methods=['GET'])
 @admin_required
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    return paginated_response(User.query, USER_FIELDS, [(User.id, False)], default_limit=None)
 
 @user_bp.route('/users', methods=['POST'])
 @admin_required
@@ -126,6 +139,7 @@ def update_user(user_id):
         user.set_password(data['password'])
     
     db.session.commit()
+    invalidate_user(user_id)
     return jsonify(user.to_dict())
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
@@ -134,4 +148,5 @@ def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user_id)
     return '', 204
@@ -0,0 +1,38 @@
+def isoformat(value):
+    return value.isoformat() if value else None
+
+
+class Projection:
+    """Builds a model's ``to_dict()`` shape straight from selected columns.
+
+    List endpoints select only these columns with ``with_entities`` and turn
+    each result row into a dict, skipping ORM object construction. Fields are
+    ``(key, column_expression)`` or ``(key, column_expression, convert)``; keep
+    them in step with the model's ``to_dict()``.
+    """
+
+    def __init__(self, *fields):
+        self.fields = [(field[0], field[1], field[2] if len(field) > 2 else None) for field in fields]
+
+    def keys(self):
+        return [key for key, _, _ in self.fields]
+
+    def only(self, keys):
+        """A projection of just the fields named in ``keys``, in this projection's order."""
+        wanted = set(keys)
+        return Projection(*[field for field in self.fields if field[0] in wanted])
+
+    def columns(self):
+        return [expression.label(key) for key, expression, _ in self.fields]
+
+    def select(self, query):
+        return query.with_entities(*self.columns())
+
+    def to_dict(self, row):
+        return {
+            key: convert(value) if convert and value is not None else value
+            for (key, _, convert), value in zip(self.fields, row)
+        }
+
+    def to_dicts(self, rows):
+        return [self.to_dict(row) for row in rows]
@@ -2,6 +2,7 @@
 let cart = [];
 let menuItems = [];
 let events = [];
+let checkoutIdempotencyKey = null;
 
 // API Base URL
 const API_BASE = '/api';
@@ -13,8 +14,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
 function initializeApp() {
     setupEventListeners();
-    loadMenuItems();
-    loadEvents();
+    loadCustomerData();
     updateCartDisplay();
     setupSmoothScrolling();
 }
@@ -114,18 +114,22 @@ function toggleMobileMenu() {
     console.log('Mobile menu toggle');
 }
 
-async function loadMenuItems() {
+async function loadCustomerData() {
     try {
         showLoading('menuGrid');
-        const response = await fetch(`${API_BASE}/menu?available=true`);
+        // Menu and events arrive together in one precompressed payload
+        const response = await fetch(`${API_BASE}/customer/bootstrap`);
         if (response.ok) {
-            menuItems = await response.json();
+            const data = await response.json();
+            menuItems = data.categories.flatMap(category => data.menu[category]);
+            events = data.events;
             displayMenuItems(menuItems);
+            displayEvents(events);
         } else {
             showError('Failed to load menu items');
         }
     } catch (error) {
-        console.error('Error loading menu items:', error);
+        console.error('Error loading menu and events:', error);
         showError('Network error while loading menu');
     }
 }
@@ -356,10 +360,20 @@ async function handleCheckout(e) {
         order_items: orderItems
     };
     
+    // Reuse the same key when the customer retries, so the server returns the original order
+    if (!checkoutIdempotencyKey) {
+        checkoutIdempotencyKey = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    }
+    
     try {
         const response = await fetch(`${API_BASE}/orders`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: {
+                'Content-Type': 'application/json',
+                'Idempotency-Key': checkoutIdempotencyKey
+            },
             body: JSON.stringify(order)
         });
         
@@ -368,6 +382,7 @@ async function handleCheckout(e) {
             showAlert(`Order placed successfully! Order #${result.id}`, 'success');
             
             // Clear cart and close modal
+            checkoutIdempotencyKey = null;
             cart = [];
             updateCartDisplay();
             closeCheckout();
@@ -378,6 +393,8 @@ async function handleCheckout(e) {
             // Show order confirmation
             showOrderConfirmation(result);
         } else {
+            // The server answered, so nothing was written; the next attempt is a new order
+            checkoutIdempotencyKey = null;
             const error = await response.json();
             showAlert(error.error || 'Failed to place order', 'error');
         }
@@ -419,20 +436,6 @@ function showOrderConfirmation(order) {
     modal.classList.add('active');
 }
 
-async function loadEvents() {
-    try {
-        const response = await fetch(`${API_BASE}/events?active=true&upcoming=true`);
-        if (response.ok) {
-            events = await response.json();
-            displayEvents(events);
-        } else {
-            console.error('Failed to load events');
-        }
-    } catch (error) {
-        console.error('Error loading events:', error);
-    }
-}
-
 function displayEvents(events) {
     const container = document.getElementById('eventsGrid');
     
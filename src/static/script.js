@@ -1,10 +1,16 @@
 // Global state
 let currentUser = null;
 let currentSection = 'dashboard';
+let dashboardState = null;
+let dashboardStream = null;
 
 // API Base URL
 const API_BASE = '/api';
 
+// Orders list paging: the URL of the current listing and the cursor of its next page
+let ordersUrl = null;
+let ordersNextCursor = null;
+
 // Initialize app
 document.addEventListener('DOMContentLoaded', function() {
     initializeApp();
@@ -47,6 +53,7 @@ function setupEventListeners() {
     document.getElementById('inventoryFilter').addEventListener('change', filterInventoryItems);
     document.getElementById('lowStockFilter').addEventListener('click', toggleLowStockFilter);
     document.getElementById('orderStatusFilter').addEventListener('change', filterOrders);
+    document.getElementById('loadMoreOrders').addEventListener('click', loadMoreOrders);
 }
 
 function showScreen(screenId) {
@@ -122,6 +129,7 @@ async function handleRegister(e) {
 async function handleLogout() {
     try {
         await fetch(`${API_BASE}/auth/logout`, { method: 'POST' });
+        closeDashboardStream();
         currentUser = null;
         showScreen('loginScreen');
     } catch (error) {
@@ -196,32 +204,130 @@ function showSection(sectionName) {
 }
 
 async function loadDashboardData() {
+    // Once the live stream is connected the dashboard is kept current by its events
+    if (dashboardState && dashboardStream) {
+        renderDashboard();
+        return;
+    }
+    await fetchDashboardState();
+    connectDashboardStream();
+}
+
+async function fetchDashboardState() {
+    const state = { stats: null, lowStockCount: 0, pendingOrders: [] };
     try {
         // Load order stats
         const statsResponse = await fetch(`${API_BASE}/orders/stats`);
         if (statsResponse.ok) {
-            const stats = await statsResponse.json();
-            document.getElementById('totalOrders').textContent = stats.total_orders;
-            document.getElementById('pendingOrders').textContent = stats.pending_orders;
-            document.getElementById('totalRevenue').textContent = `$${stats.total_revenue.toFixed(2)}`;
+            state.stats = await statsResponse.json();
         }
         
         // Load low stock items
         const lowStockResponse = await fetch(`${API_BASE}/inventory/low-stock`);
         if (lowStockResponse.ok) {
             const lowStockItems = await lowStockResponse.json();
-            document.getElementById('lowStockItems').textContent = lowStockItems.length;
+            state.lowStockCount = lowStockItems.length;
         }
         
-        // Load recent orders
+        // Load recent orders (the newest page is plenty for the five shown)
         const ordersResponse = await fetch(`${API_BASE}/orders?status=pending`);
         if (ordersResponse.ok) {
-            const orders = await ordersResponse.json();
-            displayRecentOrders(orders.slice(0, 5));
+            state.pendingOrders = await ordersResponse.json();
         }
     } catch (error) {
         console.error('Error loading dashboard data:', error);
     }
+    dashboardState = state;
+    renderDashboard();
+}
+
+function renderDashboard() {
+    const { stats, lowStockCount, pendingOrders } = dashboardState;
+    if (stats) {
+        document.getElementById('totalOrders').textContent = stats.total_orders;
+        document.getElementById('pendingOrders').textContent = stats.pending_orders;
+        document.getElementById('totalRevenue').textContent = `$${stats.total_revenue.toFixed(2)}`;
+    }
+    document.getElementById('lowStockItems').textContent = lowStockCount;
+    displayRecentOrders(pendingOrders.slice(0, 5));
+}
+
+function connectDashboardStream() {
+    if (dashboardStream || typeof EventSource === 'undefined') return;
+    
+    let interrupted = false;
+    dashboardStream = new EventSource(`${API_BASE}/stream/dashboard`);
+    dashboardStream.addEventListener('open', () => {
+        // Changes made while we were disconnected were missed, so reload once
+        if (interrupted) {
+            interrupted = false;
+            fetchDashboardState();
+        }
+    });
+    dashboardStream.addEventListener('error', () => {
+        interrupted = true;
+    });
+    dashboardStream.addEventListener('resync', () => {
+        closeDashboardStream();
+        loadDashboardData();
+    });
+    ['order_created', 'order_status', 'order_deleted', 'low_stock'].forEach(type => {
+        dashboardStream.addEventListener(type, e => applyDashboardEvent(type, JSON.parse(e.data)));
+    });
+}
+
+function closeDashboardStream() {
+    if (dashboardStream) {
+        dashboardStream.close();
+        dashboardStream = null;
+    }
+    dashboardState = null;
+}
+
+function applyDashboardEvent(type, data) {
+    if (!dashboardState) return;
+    const { stats } = dashboardState;
+    const removePending = id => {
+        dashboardState.pendingOrders = dashboardState.pendingOrders.filter(order => order.id !== id);
+    };
+    
+    switch (type) {
+        case 'order_created':
+            if (stats) {
+                stats.total_orders += 1;
+                stats.pending_orders += 1;
+            }
+            dashboardState.pendingOrders.unshift(data);
+            break;
+        case 'order_status':
+            if (stats) {
+                if (data.old_status === 'pending') stats.pending_orders -= 1;
+                if (data.status === 'pending') stats.pending_orders += 1;
+                if (data.old_status === 'completed') stats.total_revenue -= data.total_amount;
+                if (data.status === 'completed') stats.total_revenue += data.total_amount;
+            }
+            removePending(data.id);
+            if (data.status === 'pending') {
+                dashboardState.pendingOrders.push(data);
+                dashboardState.pendingOrders.sort((a, b) => b.created_at.localeCompare(a.created_at));
+            }
+            break;
+        case 'order_deleted':
+            if (stats) {
+                stats.total_orders -= 1;
+                if (data.status === 'pending') stats.pending_orders -= 1;
+                if (data.status === 'completed') stats.total_revenue -= data.total_amount;
+            }
+            removePending(data.id);
+            break;
+        case 'low_stock':
+            dashboardState.lowStockCount += data.is_low ? 1 : -1;
+            break;
+    }
+    
+    if (currentSection === 'dashboard') {
+        renderDashboard();
+    }
 }
 
 function displayRecentOrders(orders) {
@@ -457,19 +563,43 @@ function toggleLowStockFilter() {
 
 async function loadOrders() {
     try {
-        const response = await fetch(`${API_BASE}/orders`);
-        if (response.ok) {
-            const orders = await response.json();
-            displayOrders(orders);
-        }
+        await fetchOrdersPage(`${API_BASE}/orders`);
     } catch (error) {
         console.error('Error loading orders:', error);
     }
 }
 
-function displayOrders(orders) {
+// Shows the first page of ``url``, or with ``append`` adds the page after the one shown
+async function fetchOrdersPage(url, append = false) {
+    const pageUrl = append
+        ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(ordersNextCursor)}`
+        : url;
+    const response = await fetch(pageUrl);
+    if (!response.ok) throw new Error(`Request failed: ${response.status}`);
+    const orders = await response.json();
+    if (append && url !== ordersUrl) return;  // the filter changed while this page loaded
+    ordersUrl = url;
+    ordersNextCursor = response.headers.get('X-Next-Cursor');
+    displayOrders(orders, append);
+    document.getElementById('loadMoreOrders').classList.toggle('hidden', !ordersNextCursor);
+}
+
+async function loadMoreOrders() {
+    const button = document.getElementById('loadMoreOrders');
+    if (!ordersUrl || !ordersNextCursor || button.disabled) return;
+    button.disabled = true;
+    try {
+        await fetchOrdersPage(ordersUrl, true);
+    } catch (error) {
+        console.error('Error loading more orders:', error);
+    } finally {
+        button.disabled = false;
+    }
+}
+
+function displayOrders(orders, append = false) {
     const container = document.getElementById('ordersList');
-    container.innerHTML = orders.map(order => `
+    const html = orders.map(order => `
         <div class="order-card">
             <div class="order-header">
                 <span class="order-id">Order #${order.id}</span>
@@ -503,9 +633,15 @@ function displayOrders(orders) {
             </div>
         </div>
     `).join('');
+    if (append) {
+        container.insertAdjacentHTML('beforeend', html);
+    } else {
+        container.innerHTML = html;
+    }
     
-    // Add event listeners for status changes
-    document.querySelectorAll('.order-status-select').forEach(select => {
+    // Add event listeners for status changes (once per select; earlier pages already have theirs)
+    document.querySelectorAll('.order-status-select:not([data-bound])').forEach(select => {
+        select.dataset.bound = 'true';
         select.addEventListener('change', updateOrderStatus);
     });
 }
@@ -536,9 +672,7 @@ function filterOrders() {
     let url = `${API_BASE}/orders`;
     if (status) url += `?status=${status}`;
     
-    fetch(url)
-        .then(response => response.json())
-        .then(orders => displayOrders(orders))
+    fetchOrdersPage(url)
         .catch(error => console.error('Error filtering orders:', error));
 }
 
@@ -0,0 +1,131 @@
+"""Fingerprinted, precompressed static files.
+
+``StaticAssets.build()`` runs once at startup. It copies every file in the
+static folder to the build directory under a content-hashed name such as
+``script.3f2a9c1b.js``, with ``.gz`` (and, if the optional ``brotli`` package
+is installed, ``.br``) siblings for text files. Asset references in HTML
+pages are rewritten to the hashed names. Requests are then answered from an
+in-memory manifest: hashed names are cached by browsers for a year as
+immutable, and everything else (the HTML pages, and assets requested by
+their original names) must be revalidated with its ETag.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from flask import send_file
+from src.cache import brotli, preferred_encoding
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'image/vnd.microsoft.icon', 'image/x-icon')
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_REFERENCE = re.compile(r'''(\b(?:src|href)=["'])([^"'#?:]+)(["'])''')
+
+
+class Asset:
+    def __init__(self, mimetype, files, etag, immutable):
+        self.mimetype = mimetype
+        self.files = files  # encoding (None for identity) -> path in the build directory
+        self.etag = etag
+        self.immutable = immutable
+
+    def response(self):
+        encoding = preferred_encoding(self.files)
+        response = send_file(self.files[encoding], mimetype=self.mimetype,
+                             etag=f'{self.etag}-{encoding}' if encoding else self.etag,
+                             conditional=True, max_age=IMMUTABLE_MAX_AGE if self.immutable else None)
+        # send_file names the fingerprinted build file; pages are not downloads
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if len(self.files) > 1:
+            response.vary.add('Accept-Encoding')
+        if self.immutable:
+            response.cache_control.immutable = True  # send_file already made it public for a year
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+
+def _write_once(path, data):
+    # Build files are named by content, so an existing file is already correct;
+    # the atomic rename lets several workers build at the same time
+    if os.path.exists(path):
+        return
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class StaticAssets:
+    def __init__(self, source_dir, build_dir):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.manifest = {}  # URL path -> Asset
+        self.hashed_names = {}  # original path -> fingerprinted path
+
+    def source_files(self):
+        for directory, dirnames, filenames in os.walk(self.source_dir):
+            dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+            for filename in sorted(filenames):
+                if not filename.startswith('.'):
+                    path = os.path.join(directory, filename)
+                    yield os.path.relpath(path, self.source_dir).replace(os.sep, '/'), path
+
+    def _store(self, path, data):
+        """Write ``data`` and its compressed variants to the build directory under a hashed name."""
+        digest = hashlib.sha256(data).hexdigest()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        stem, extension = os.path.splitext(path)
+        hashed_path = f'{stem}.{digest[:16]}{extension}'
+        target = os.path.join(self.build_dir, hashed_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _write_once(target, data)
+        files = {None: target}
+        if len(data) >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES):
+            variants = [('gzip', '.gz', lambda: gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                variants.append(('br', '.br', lambda: brotli.compress(data)))
+            for encoding, suffix, compress in variants:
+                if not os.path.exists(target + suffix):
+                    compressed = compress()
+                    if len(compressed) >= len(data):
+                        continue
+                    _write_once(target + suffix, compressed)
+                files[encoding] = target + suffix
+        return hashed_path, Asset(mimetype, files, digest, immutable=False)
+
+    def _rewrite_html(self, html):
+        def replace(match):
+            hashed = self.hashed_names.get(match.group(2))
+            return match.group(1) + hashed + match.group(3) if hashed else match.group(0)
+        return _REFERENCE.sub(replace, html)
+
+    def build(self):
+        """Fingerprint and compress every static file and rebuild the manifest."""
+        manifest, hashed_names, pages = {}, {}, []
+        self.hashed_names = hashed_names
+        for path, source in self.source_files():
+            if path.endswith('.html'):
+                pages.append((path, source))
+                continue
+            with open(source, 'rb') as f:
+                hashed_path, asset = self._store(path, f.read())
+            hashed_names[path] = hashed_path
+            manifest[path] = asset
+            manifest[hashed_path] = Asset(asset.mimetype, asset.files, asset.etag, immutable=True)
+        for path, source in pages:
+            # Pages keep their names (they are entry points) and point at the hashed assets
+            with open(source, encoding='utf-8') as f:
+                html = self._rewrite_html(f.read()).encode('utf-8')
+            manifest[path] = self._store(path, html)[1]
+        self.manifest = manifest
+        return len(manifest)
+
+    def find(self, path):
+        return self.manifest.get(path)